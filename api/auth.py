@@ -2,8 +2,11 @@ from flask import Blueprint, request, jsonify, session
 from auth.decorators import login_required, twofa_required, admin_required, editor_required
 from models.user import Usuario
 from auth.utils import generar_codigo_verificacion, enviar_correo, verificar_conexion
+from utils.conectividad import monitor_conectividad
 from utils.validation import validar_nombre, validar_password, validar_email
 from utils.database import get_connection
+from utils.limite_login import limitador_login, ip_cliente
+from utils.hash_password import HashSaturadoError, BCRYPT_REINTENTAR
 
 api_auth_bp = Blueprint('api_auth', __name__)
 
@@ -34,6 +37,15 @@ def api_login():
         if not es_valida:
             return jsonify({'error': mensaje_error}), 400
         
+        ip = ip_cliente()
+        espera = limitador_login.espera(email, ip)
+        if espera:
+            return jsonify({
+                'error': f'Demasiados intentos fallidos. Intenta de nuevo en {espera} segundos.',
+                'code': 'LOGIN_THROTTLED',
+                'retry_after': espera
+            }), 429, {'Retry-After': str(espera)}
+        
         from auth.utils import usuario_tiene_sesion_activa
         sesion_activa = usuario_tiene_sesion_activa(email)
         
@@ -44,7 +56,9 @@ def api_login():
         
         usuario = Usuario.verificar_login(email, password)
         if not usuario:
+            limitador_login.registrar_fallo(email, ip)
             return jsonify({'error': 'Credenciales incorrectas'}), 401        
+        limitador_login.registrar_exito(email, ip)
         
         codigo_verificacion = generar_codigo_verificacion()
         exito_guardado = Usuario.guardar_codigo_verificacion(email, codigo_verificacion)
@@ -79,6 +93,12 @@ def api_login():
         
         return jsonify(response_data), 200
         
+    except HashSaturadoError:
+        return jsonify({
+            'error': 'El servicio está ocupado. Intenta de nuevo en unos segundos.',
+            'code': 'SERVICIO_OCUPADO',
+            'retry_after': BCRYPT_REINTENTAR
+        }), 503, {'Retry-After': str(BCRYPT_REINTENTAR)}
     except Exception as e:
         error_message = f'Error interno del servidor: {str(e)}'
         print(f"Exception en api_login (email: {email}): {error_message}")
@@ -155,6 +175,14 @@ def api_logout():
         'message': 'Sesión cerrada exitosamente'
     }), 200
 
+@api_auth_bp.route('/auth/login/metricas', methods=['GET'])
+@login_required
+@twofa_required
+@admin_required
+def api_login_metricas():
+    """Contadores del límite de intentos de login de este proceso - Solo Admin"""
+    return jsonify(limitador_login.estadisticas()), 200
+
 @api_auth_bp.route('/auth/register', methods=['POST'])
 def api_register():
     """Endpoint para registro de usuarios"""
@@ -470,12 +498,15 @@ def health_check():
 
 @api_auth_bp.route('/connection/status')
 def connection_status():
-    """Verificar estado de conexión"""
-    tiene_conexion = verificar_conexion()
+    """Verificar estado de conexión (último resultado del monitor en segundo plano)"""
+    estado = monitor_conectividad.estado()
+    tiene_conexion = estado['online']
     return jsonify({
         'online': tiene_conexion,
         'modo_operacion': 'online' if tiene_conexion else 'offline',
-        'servicios_disponibles': 'completos' if tiene_conexion else 'limitados'
+        'servicios_disponibles': 'completos' if tiene_conexion else 'limitados',
+        'verificado': estado['verificado'].isoformat() if estado['verificado'] else None,
+        'latencia_ms': estado['latencia_ms']
     })
 
 from datetime import datetime
\ No newline at end of file
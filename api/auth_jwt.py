@@ -7,6 +7,8 @@ from models.user import Usuario
 from utils.validation import validar_email, validar_password
 from auth.utils import generar_codigo_verificacion, enviar_correo, verificar_conexion
 from utils.database import get_connection
+from utils.limite_login import limitador_login, ip_cliente
+from utils.hash_password import HashSaturadoError, BCRYPT_REINTENTAR
 
 auth_jwt_bp = Blueprint('auth_jwt', __name__)
 
@@ -69,10 +71,19 @@ def jwt_login():
         if '@' in email and not validar_email(email):
             return jsonify({'detail': 'Formato de email inválido'}), 400
         
+        ip = ip_cliente()
+        espera = limitador_login.espera(email, ip)
+        if espera:
+            return jsonify({
+                'detail': f'Demasiados intentos fallidos. Intenta de nuevo en {espera} segundos.'
+            }), 429, {'Retry-After': str(espera)}
+        
         # Verificar credenciales
         usuario = Usuario.verificar_login(email, password)
         if not usuario:
+            limitador_login.registrar_fallo(email, ip)
             return jsonify({'detail': 'Credenciales incorrectas'}), 401
+        limitador_login.registrar_exito(email, ip)
         
         # Generar JWT token
         token_payload = {
@@ -113,6 +124,10 @@ def jwt_login():
             }
         }), 200
         
+    except HashSaturadoError:
+        return jsonify({
+            'detail': 'El servicio está ocupado. Intenta de nuevo en unos segundos.'
+        }), 503, {'Retry-After': str(BCRYPT_REINTENTAR)}
     except Exception as e:
         print(f"❌ Error en jwt_login: {str(e)}")
         return jsonify({'detail': f'Error en el servidor: {str(e)}'}), 500
@@ -135,6 +150,13 @@ def jwt_login_2fa():
         if not validar_email(email):
             return jsonify({'detail': 'Formato de email inválido'}), 400
         
+        ip = ip_cliente()
+        espera = limitador_login.espera(email, ip)
+        if espera:
+            return jsonify({
+                'detail': f'Demasiados intentos fallidos. Intenta de nuevo en {espera} segundos.'
+            }), 429, {'Retry-After': str(espera)}
+        
         # Verificar si ya tiene sesión activa
         from auth.utils import usuario_tiene_sesion_activa
         sesion_activa = usuario_tiene_sesion_activa(email)
@@ -147,7 +169,9 @@ def jwt_login_2fa():
         # Verificar credenciales
         usuario = Usuario.verificar_login(email, password)
         if not usuario:
+            limitador_login.registrar_fallo(email, ip)
             return jsonify({'detail': 'Credenciales incorrectas'}), 401
+        limitador_login.registrar_exito(email, ip)
         
         # Generar código 2FA
         codigo_verificacion = generar_codigo_verificacion()
@@ -181,6 +205,10 @@ def jwt_login_2fa():
         
         return jsonify(response_data), 200
         
+    except HashSaturadoError:
+        return jsonify({
+            'detail': 'El servicio está ocupado. Intenta de nuevo en unos segundos.'
+        }), 503, {'Retry-After': str(BCRYPT_REINTENTAR)}
     except Exception as e:
         print(f"❌ Error en jwt_login_2fa: {str(e)}")
         return jsonify({'detail': f'Error en el servidor: {str(e)}'}), 500
@@ -1,31 +1,83 @@
 # api/inventory.py - VERSIÓN CON JWT INTEGRADO
-from flask import Blueprint, request, jsonify
-from auth.decorators import login_required, twofa_required, editor_required, admin_required, rol_requerido
+from flask import Blueprint, request, jsonify, make_response, Response, stream_with_context
+from functools import wraps
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from sqlalchemy import func, case, select
+from auth.decorators import autorizado
 from controllers.inventario_controller import InventarioController
-from models import Movimiento
+from models import Movimiento, VersionCatalogo
+from utils.eventos import bus_eventos
+from utils.outbox import estadisticas as estadisticas_outbox
 
 inventory_bp = Blueprint('inventory', __name__)
 
+# Duración máxima de una conexión /stream; EventSource reconecta solo al cerrarse
+STREAM_DURACION_MAX = int(os.getenv('EVENTOS_SSE_DURACION_MAX', 300))
+STREAM_PING_SEGUNDOS = 15
+# Streams abiertos a la vez por proceso; deben quedar hilos libres para el resto (ver gunicorn.conf.py)
+STREAM_MAX_CONEXIONES = int(os.getenv('EVENTOS_SSE_MAX_CONEXIONES', 4))
+
+_streams_disponibles = threading.BoundedSemaphore(STREAM_MAX_CONEXIONES)
+
+# Filas por lote al leer y enviar reportes grandes
+REPORTE_LOTE_FILAS = 500
+
+# ===== GET CONDICIONAL (ETag) =====
+
+def con_etag(f):
+    """
+    Responder 304 si el catálogo no cambió desde el ETag que envía el cliente.
+    El ETag combina la versión del catálogo con la URL (filtros y página), así
+    una respuesta que no cambió no se vuelve a consultar ni serializar.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version = VersionCatalogo.actual()
+        # Prefijo 's': las versiones vienen de catalogo_version_seq y no deben coincidir con ETags anteriores
+        etag = f"s{version}-{zlib.crc32(request.full_path.encode('utf-8')):08x}"
+        
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        response.set_etag(etag)
+        # El navegador guarda la respuesta pero la revalida en cada petición
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
 # ===== ENDPOINTS DE PRODUCTOS =====
 
 @inventory_bp.route('/productos', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
+@con_etag
 def api_inventario_productos_get():
     """Obtener lista de productos - Todos los roles"""
     return InventarioController.obtener_productos()
 
+@inventory_bp.route('/categorias', methods=['GET'])
+@autorizado()
+@con_etag
+def api_inventario_categorias_get():
+    """Obtener categorías de productos - Todos los roles"""
+    return InventarioController.obtener_categorias()
+
 @inventory_bp.route('/productos', methods=['POST'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_productos_post():
     """Crear nuevo producto - Editores y Admins"""
     return InventarioController.crear_producto()
 
 @inventory_bp.route('/productos/<int:producto_id>', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
 def api_inventario_producto_get(producto_id):
     """Obtener producto específico - Todos los roles"""
     from models import Producto
@@ -35,58 +87,57 @@ def api_inventario_producto_get(producto_id):
     return jsonify(producto.to_dict()), 200
 
 @inventory_bp.route('/productos/<int:producto_id>', methods=['PUT'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_productos_put(producto_id):
     """Actualizar producto - Editores y Admins"""
     return InventarioController.actualizar_producto(producto_id)
 
 @inventory_bp.route('/productos/<int:producto_id>/desactivar', methods=['PUT'])
-@login_required
-@twofa_required
-@admin_required
+@autorizado(roles=('admin',))
 def api_inventario_productos_desactivar(producto_id):
     """Desactivar producto - Solo Admin"""
     return InventarioController.desactivar_producto(producto_id)
 
 @inventory_bp.route('/productos/<int:producto_id>/activar', methods=['PUT'])
-@login_required
-@twofa_required
-@admin_required
+@autorizado(roles=('admin',))
 def api_inventario_productos_activar(producto_id):
     """Activar producto - Solo Admin"""
     return InventarioController.activar_producto(producto_id)
 
 @inventory_bp.route('/productos/<int:producto_id>', methods=['DELETE'])
-@login_required
-@twofa_required
-@admin_required
+@autorizado(roles=('admin',))
 def api_inventario_productos_delete(producto_id):
     """Eliminar producto - Solo Admin"""
     return InventarioController.eliminar_producto(producto_id)
 
+@inventory_bp.route('/productos/importar', methods=['POST'])
+@autorizado(roles=('admin',))
+def api_inventario_productos_importar():
+    """Importar productos desde CSV o NDJSON - Solo Admin"""
+    return InventarioController.importar_productos()
+
 # ===== ENDPOINTS DE MOVIMIENTOS =====
 
 @inventory_bp.route('/entradas', methods=['POST'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_entradas():
     """Registrar entrada de inventario - Editores y Admins"""
     return InventarioController.registrar_entrada()
 
 @inventory_bp.route('/salidas', methods=['POST'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_salidas():
     """Registrar salida de inventario - Editores y Admins"""
     return InventarioController.registrar_salida()
 
+@inventory_bp.route('/movimientos/lote', methods=['POST'])
+@autorizado(roles=('admin', 'editor'))
+def api_inventario_movimientos_lote():
+    """Registrar un lote de entradas y salidas en una sola transacción - Editores y Admins"""
+    return InventarioController.registrar_movimientos_lote()
+
 @inventory_bp.route('/movimientos', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
 def api_inventario_movimientos():
     """Obtener historial de movimientos - Todos los roles"""
     return InventarioController.obtener_movimientos()
@@ -94,25 +145,83 @@ def api_inventario_movimientos():
 # ===== ENDPOINTS DE ALERTAS =====
 
 @inventory_bp.route('/alertas', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
+@con_etag
 def api_inventario_alertas():
     """Obtener alertas de stock bajo - Todos los roles"""
     return InventarioController.obtener_alertas_stock()
 
+@inventory_bp.route('/notificaciones/metricas', methods=['GET'])
+@autorizado(roles=('admin',))
+def api_inventario_notificaciones_metricas():
+    """Estado del outbox de notificaciones (pendientes, fallidas, antigüedad, intentos) - Solo Admin"""
+    return jsonify(estadisticas_outbox()), 200
+
+# ===== EVENTOS EN VIVO (Server-Sent Events) =====
+
+@inventory_bp.route('/stream', methods=['GET'])
+@autorizado()
+def api_inventario_stream():
+    """Cambios de productos y alertas en vivo (text/event-stream) - Todos los roles"""
+    # Un worker sync de gunicorn no envía su heartbeat mientras sostiene el stream y el
+    # arbiter lo mata al vencer --timeout: ahí el cliente se queda con el sondeo periódico
+    if not request.environ.get('wsgi.multithread'):
+        return jsonify({
+            'error': 'Eventos en vivo no disponibles con este servidor',
+            'code': 'STREAM_NO_DISPONIBLE'
+        }), 503
+    
+    if not _streams_disponibles.acquire(blocking=False):
+        return jsonify({
+            'error': 'Demasiadas conexiones de eventos en vivo',
+            'code': 'STREAM_SATURADO'
+        }), 503, {'Retry-After': '60'}
+    
+    suscripcion = bus_eventos.suscribir()
+    liberado = []
+    
+    def liberar():
+        # call_on_close corre aunque el generador nunca haya empezado
+        if not liberado:
+            liberado.append(True)
+            bus_eventos.desuscribir(suscripcion)
+            _streams_disponibles.release()
+    
+    def generar():
+        limite = time.monotonic() + STREAM_DURACION_MAX
+        yield 'retry: 5000\n\n'
+        while time.monotonic() < limite:
+            if suscripcion.desbordada:
+                # Se perdieron eventos por cola llena: el cliente recarga la lista completa
+                suscripcion.desbordada = False
+                while not suscripcion.empty():
+                    suscripcion.get_nowait()
+                yield 'event: resync\ndata: {}\n\n'
+                continue
+            try:
+                evento = suscripcion.get(timeout=STREAM_PING_SEGUNDOS)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield f"event: {evento['tipo']}\ndata: {json.dumps(evento['datos'])}\n\n"
+    
+    response = Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(liberar)
+    return response
+
 # ===== ENDPOINTS DE PROVEEDORES =====
 
 @inventory_bp.route('/proveedores', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
 def api_inventario_proveedores_get():
     """Obtener lista de proveedores - Todos los roles"""
     return InventarioController.obtener_proveedores()
 
 @inventory_bp.route('/proveedores', methods=['POST'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_proveedores_post():
     """Crear nuevo proveedor - Editores y Admins"""
     return InventarioController.crear_proveedor()
@@ -120,16 +229,13 @@ def api_inventario_proveedores_post():
 # ===== ENDPOINTS DE CLIENTES =====
 
 @inventory_bp.route('/clientes', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
 def api_inventario_clientes_get():
     """Obtener lista de clientes - Todos los roles"""
     return InventarioController.obtener_clientes()
 
 @inventory_bp.route('/clientes', methods=['POST'])
-@login_required
-@twofa_required
-@rol_requerido('admin', 'editor')
+@autorizado(roles=('admin', 'editor'))
 def api_inventario_clientes_post():
     """Crear nuevo cliente - Editores y Admins"""
     return InventarioController.crear_cliente()
@@ -137,48 +243,55 @@ def api_inventario_clientes_post():
 # ===== ENDPOINTS DE REPORTES =====
 
 @inventory_bp.route('/reportes/stock-bajo', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
+@con_etag
 def api_inventario_reportes_stock_bajo():
     """Reporte de stock bajo - Todos los roles"""
     return InventarioController.obtener_alertas_stock()
 
 @inventory_bp.route('/reportes/movimientos-detallados', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
 def api_inventario_reportes_movimientos_detallados():
-    """Reporte detallado de movimientos - Todos los roles"""
+    """
+    Reporte detallado de movimientos - Todos los roles.
+    Los totales se calculan en SQL y los movimientos se envían en streaming
+    (JSON por partes, o NDJSON con ?formato=ndjson: primera línea con
+    resumen y filtros, luego un movimiento por línea).
+    """
     try:
+        from models import db
+        
         # Parámetros para reporte detallado
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
         producto_id = request.args.get('producto_id', type=int)
         tipo = request.args.get('tipo')  # 'Entrada' o 'Salida'
+        formato = request.args.get('formato', 'json')
         
-        query = Movimiento.query
-        
+        filtros = []
         if fecha_inicio:
-            query = query.filter(Movimiento.Fecha >= fecha_inicio)
+            filtros.append(Movimiento.Fecha >= fecha_inicio)
         if fecha_fin:
-            query = query.filter(Movimiento.Fecha <= fecha_fin)
+            filtros.append(Movimiento.Fecha <= fecha_fin)
         if producto_id:
-            query = query.filter_by(ID_Producto=producto_id)
+            filtros.append(Movimiento.ID_Producto == producto_id)
         if tipo and tipo in ['Entrada', 'Salida']:
-            query = query.filter_by(Tipo=tipo)
-        
-        movimientos = query.order_by(Movimiento.Fecha.desc()).all()
+            filtros.append(Movimiento.Tipo == tipo)
         
-        # Calcular resumen
-        total_entradas = sum(m.Cantidad for m in movimientos if m.Tipo == 'Entrada')
-        total_salidas = sum(m.Cantidad for m in movimientos if m.Tipo == 'Salida')
+        # Calcular resumen en la base de datos
+        total_entradas, total_salidas, total_movimientos = db.session.query(
+            func.coalesce(func.sum(case((Movimiento.Tipo == 'Entrada', Movimiento.Cantidad), else_=0)), 0),
+            func.coalesce(func.sum(case((Movimiento.Tipo == 'Salida', Movimiento.Cantidad), else_=0)), 0),
+            func.count(Movimiento.ID_Movimiento)
+        ).filter(*filtros).one()
+        total_entradas, total_salidas = int(total_entradas), int(total_salidas)
         
-        return jsonify({
-            'movimientos': [movimiento.to_dict() for movimiento in movimientos],
+        encabezado = {
             'resumen': {
                 'total_entradas': total_entradas,
                 'total_salidas': total_salidas,
                 'balance': total_entradas - total_salidas,
-                'total_movimientos': len(movimientos)
+                'total_movimientos': total_movimientos
             },
             'filtros_aplicados': {
                 'fecha_inicio': fecha_inicio,
@@ -186,38 +299,99 @@ def api_inventario_reportes_movimientos_detallados():
                 'producto_id': producto_id,
                 'tipo': tipo
             }
-        }), 200
+        }
+        
+        # Nombres relacionados por JOIN y filas leídas por lotes
+        consulta = Movimiento.con_nombres(select(Movimiento)).where(*filtros).order_by(Movimiento.Fecha.desc())
+        filas = db.session.execute(consulta.execution_options(yield_per=REPORTE_LOTE_FILAS))
+        
+        def movimientos_json():
+            for movimiento, producto_nombre, proveedor_nombre, cliente_nombre in filas:
+                yield json.dumps(movimiento.to_dict_con_nombres(producto_nombre, proveedor_nombre, cliente_nombre))
+        
+        def generar_json():
+            yield json.dumps(encabezado)[:-1] + ', "movimientos": ['
+            lote = []
+            for i, fila in enumerate(movimientos_json()):
+                lote.append(fila if i == 0 else ',' + fila)
+                if len(lote) >= REPORTE_LOTE_FILAS:
+                    yield ''.join(lote)
+                    lote = []
+            yield ''.join(lote) + ']}'
+        
+        def generar_ndjson():
+            yield json.dumps(encabezado) + '\n'
+            lote = []
+            for fila in movimientos_json():
+                lote.append(fila + '\n')
+                if len(lote) >= REPORTE_LOTE_FILAS:
+                    yield ''.join(lote)
+                    lote = []
+            yield ''.join(lote)
+        
+        if formato == 'ndjson':
+            return Response(stream_with_context(generar_ndjson()), mimetype='application/x-ndjson')
+        return Response(stream_with_context(generar_json()), mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Error al generar reporte: {str(e)}'}), 500
 
 @inventory_bp.route('/reportes/resumen', methods=['GET'])
-@login_required
-@twofa_required
+@autorizado()
+@con_etag
 def api_inventario_reportes_resumen():
-    """Resumen general del inventario - Todos los roles"""
+    """Resumen general del inventario - Todos los roles (?por_categoria=true agrega el desglose)"""
     try:
-        from models import Producto
+        from models import db, Producto
         
-        productos = Producto.query.filter_by(Activo=True).all()
+        # Un solo agregado en la base de datos: una fila sin importar el tamaño del catálogo
+        agregados = (
+            func.count(Producto.ID_Producto),
+            func.count(Producto.ID_Producto).filter(Producto.Stock_Actual <= Producto.Stock_Minimo),
+            func.count(Producto.ID_Producto).filter(Producto.Stock_Actual == 0),
+            func.coalesce(func.sum(Producto.Stock_Actual), 0)
+        )
         
-        total_productos = len(productos)
-        productos_stock_bajo = sum(1 for p in productos if p.Stock_Actual <= p.Stock_Minimo)
-        productos_sin_stock = sum(1 for p in productos if p.Stock_Actual == 0)
-        valor_total_unidades = sum(p.Stock_Actual for p in productos)
+        # Bajo el mínimo sin estar agotado (criterio de las alertas y del tablero)
+        bajo_minimo = func.count(Producto.ID_Producto).filter(
+            Producto.Stock_Actual > 0, Producto.Stock_Actual < Producto.Stock_Minimo
+        )
         
-        return jsonify({
+        total_productos, productos_stock_bajo, productos_sin_stock, valor_total_unidades, productos_bajo_minimo = (
+            db.session.query(*agregados, bajo_minimo).filter(Producto.Activo == True).one()
+        )
+        
+        respuesta = {
             'resumen': {
                 'total_productos_activos': total_productos,
                 'productos_stock_bajo': productos_stock_bajo,
                 'productos_sin_stock': productos_sin_stock,
-                'total_unidades_inventario': valor_total_unidades
+                'productos_bajo_minimo': productos_bajo_minimo,
+                'total_unidades_inventario': int(valor_total_unidades)
             },
             'alertas': {
                 'criticas': productos_sin_stock,
                 'advertencias': productos_stock_bajo - productos_sin_stock
             }
-        }), 200
+        }
+        
+        if request.args.get('por_categoria', 'false').lower() == 'true':
+            filas = (
+                db.session.query(Producto.Categoria, *agregados)
+                .filter(Producto.Activo == True)
+                .group_by(Producto.Categoria)
+                .order_by(Producto.Categoria)
+                .all()
+            )
+            respuesta['por_categoria'] = [{
+                'categoria': categoria,
+                'total_productos_activos': total,
+                'productos_stock_bajo': bajo,
+                'productos_sin_stock': sin_stock,
+                'total_unidades_inventario': int(unidades)
+            } for categoria, total, bajo, sin_stock, unidades in filas]
+        
+        return jsonify(respuesta), 200
         
     except Exception as e:
         return jsonify({'error': f'Error al generar resumen: {str(e)}'}), 500
\ No newline at end of file
@@ -24,15 +24,31 @@ if os.getenv('RENDER', 'false').lower() == 'true':
     DB_PORT = os.getenv('DB_PORT', '5432')
     
     app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql+pg8000://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+    # Un solo pool por worker: utils.database.get_connection toma sus conexiones de este engine
+    from utils.database import opciones_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_engine()
     print("✅ Usando PostgreSQL en Render")
 else:
     # SQLite en local
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///seguridad.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLITE_URI', 'sqlite:///seguridad.db')
     print("✅ Usando SQLite en local")
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
+# Una conexión y una transacción por solicitud para el SQL puro (models/user.py, auth/utils.py)
+from utils.database import registrar_unidad_de_trabajo, registrar_contador_consultas
+registrar_unidad_de_trabajo(app)
+
+# Despachar notificaciones_outbox desde la propia web salvo que corra despachar_notificaciones.py
+if os.getenv('OUTBOX_DESPACHADOR_INTERNO', 'true').lower() == 'true':
+    from utils.outbox import registrar_despachador_interno
+    registrar_despachador_interno(app)
+
+# Cabecera X-Query-Count para vigilar el número de consultas de cada endpoint
+if os.getenv('CONTAR_CONSULTAS', 'false').lower() == 'true':
+    registrar_contador_consultas(app)
+
 # Función para crear tablas adicionales que no son de SQLAlchemy ORM
 def crear_tablas_adicionales():
     """Crear tablas que usan SQL puro (no SQLAlchemy ORM)"""
@@ -1,23 +1,71 @@
 # auth/decorators.py - VERSIÓN CON JWT INTEGRADO
+from collections import OrderedDict
 from functools import wraps
-from flask import session, redirect, url_for, flash, request, jsonify
+from flask import session, redirect, url_for, flash, request, jsonify, g
 import jwt
 import os
+import threading
+import time
 
 # Configuración JWT (debe coincidir con swagger_config.py)
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'tu-clave-secreta-super-segura-12345')
 JWT_ALGORITHM = 'HS256'
 
-def verificar_token_jwt(token):
-    """Verificar y decodificar token JWT"""
+# Tokens ya verificados que se recuerdan (LRU); cada uno vale hasta su 'exp'
+JWT_CACHE_MAX = int(os.getenv('JWT_CACHE_MAX', 1024))
+
+_tokens_verificados = OrderedDict()  # token -> (payload, exp)
+_tokens_lock = threading.Lock()
+
+def _decodificar_token_jwt(token):
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def verificar_token_jwt(token):
+    """Verificar y decodificar token JWT (los ya verificados se sirven del LRU hasta su expiración)"""
+    ahora = time.time()
+    with _tokens_lock:
+        guardado = _tokens_verificados.get(token)
+        if guardado:
+            payload, exp = guardado
+            if exp > ahora:
+                _tokens_verificados.move_to_end(token)
+                return dict(payload)
+            del _tokens_verificados[token]
+            return None
+    
+    payload = _decodificar_token_jwt(token)
+    
+    # Solo se recuerdan tokens con expiración: el LRU nunca alarga su validez
+    if payload and isinstance(payload.get('exp'), (int, float)) and JWT_CACHE_MAX > 0:
+        with _tokens_lock:
+            _tokens_verificados[token] = (dict(payload), payload['exp'])
+            _tokens_verificados.move_to_end(token)
+            while len(_tokens_verificados) > JWT_CACHE_MAX:
+                _tokens_verificados.popitem(last=False)
+    return payload
+
+def payload_jwt_de_request():
+    """
+    Payload del JWT de la petición actual, verificado una sola vez por petición
+    aunque se apilen varios decoradores (memo en flask.g por token).
+    """
+    token = obtener_token_de_request()
+    if not token:
+        return None
+    
+    memo = g.get('_jwt_verificado')
+    if memo and memo[0] == token:
+        return memo[1]
+    
+    payload = verificar_token_jwt(token)
+    g._jwt_verificado = (token, payload)
+    return payload
+
 def obtener_token_de_request():
     """
     Obtener token JWT de múltiples fuentes:
@@ -50,16 +98,14 @@ def obtener_usuario_actual():
     Retorna dict con user_id, email, nombre, rol o None.
     """
     # Primero intentar con JWT
-    token = obtener_token_de_request()
-    if token:
-        payload = verificar_token_jwt(token)
-        if payload:
-            return {
-                'user_id': payload.get('user_id'),
-                'email': payload.get('email'),
-                'nombre': payload.get('nombre'),
-                'rol': payload.get('rol')
-            }
+    payload = payload_jwt_de_request()
+    if payload:
+        return {
+            'user_id': payload.get('user_id'),
+            'email': payload.get('email'),
+            'nombre': payload.get('nombre'),
+            'rol': payload.get('rol')
+        }
     
     # Si no hay JWT válido, intentar con sesión de Flask
     if 'user_id' in session:
@@ -119,17 +165,15 @@ def twofa_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Si hay JWT válido, el 2FA ya se completó (el token se genera después del 2FA)
-        token = obtener_token_de_request()
-        if token:
-            payload = verificar_token_jwt(token)
-            if payload:
-                request.current_user = {
-                    'user_id': payload.get('user_id'),
-                    'email': payload.get('email'),
-                    'nombre': payload.get('nombre'),
-                    'rol': payload.get('rol')
-                }
-                return f(*args, **kwargs)
+        payload = payload_jwt_de_request()
+        if payload:
+            request.current_user = {
+                'user_id': payload.get('user_id'),
+                'email': payload.get('email'),
+                'nombre': payload.get('nombre'),
+                'rol': payload.get('rol')
+            }
+            return f(*args, **kwargs)
         
         # Si no hay JWT, verificar sesión de Flask
         if 'user_id' not in session:
@@ -274,7 +318,7 @@ def jwt_required(f):
                 'code': 'NO_TOKEN'
             }), 401
         
-        payload = verificar_token_jwt(token)
+        payload = payload_jwt_de_request()
         
         if not payload:
             return jsonify({
@@ -290,4 +334,80 @@ def jwt_required(f):
         }
         
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+# ===== DECORADOR UNIFICADO (una sola pasada) =====
+
+def autorizado(roles=None, twofa=True):
+    """
+    Equivale a apilar @login_required, @twofa_required y @rol_requerido/@admin_required,
+    pero resuelve el usuario una sola vez y revisa todas las políticas en una pasada.
+    Uso: @autorizado(), @autorizado(roles=('admin', 'editor')), @autorizado(roles=('admin',))
+    Con roles=('admin',) responde ADMIN_REQUIRED; con otros roles, INSUFFICIENT_ROLE.
+    """
+    roles_permitidos = tuple(roles) if roles else None
+    solo_admin = roles_permitidos == ('admin',)
+    
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            usuario = None
+            
+            # Con JWT válido el 2FA ya se completó (el token se genera después del 2FA)
+            payload = payload_jwt_de_request()
+            if payload:
+                usuario = {
+                    'user_id': payload.get('user_id'),
+                    'email': payload.get('email'),
+                    'nombre': payload.get('nombre'),
+                    'rol': payload.get('rol')
+                }
+            elif 'user_id' in session:
+                if twofa and not session.get('twofa_verified', False):
+                    if es_request_api():
+                        return jsonify({
+                            'error': 'Verificación 2FA requerida',
+                            'code': '2FA_REQUIRED'
+                        }), 401
+                    else:
+                        flash('Debes completar la verificación de dos factores', 'warning')
+                        return redirect(url_for('auth.verificar_2fa'))
+                usuario = {
+                    'user_id': session.get('user_id'),
+                    'email': session.get('user_email'),
+                    'nombre': session.get('user_nombre'),
+                    'rol': session.get('user_rol')
+                }
+            
+            if not usuario:
+                if es_request_api():
+                    return jsonify({
+                        'error': 'Autenticación requerida',
+                        'code': 'AUTH_REQUIRED'
+                    }), 401
+                else:
+                    flash('Debes iniciar sesión para acceder a esta página', 'error')
+                    return redirect(url_for('auth.login'))
+            
+            if roles_permitidos and usuario.get('rol') not in roles_permitidos:
+                if solo_admin:
+                    if es_request_api():
+                        return jsonify({
+                            'error': 'Acceso denegado. Se requiere rol de administrador.',
+                            'code': 'ADMIN_REQUIRED'
+                        }), 403
+                    else:
+                        flash('No tienes permisos de administrador para acceder a esta página', 'error')
+                        return redirect(url_for('users.listar_usuarios'))
+                if es_request_api():
+                    return jsonify({
+                        'error': f'Acceso denegado. Roles permitidos: {", ".join(roles_permitidos)}',
+                        'code': 'INSUFFICIENT_ROLE'
+                    }), 403
+                else:
+                    flash(f'No tienes permisos para acceder. Roles requeridos: {", ".join(roles_permitidos)}', 'error')
+                    return redirect(url_for('users.listar_usuarios'))
+            
+            request.current_user = usuario
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
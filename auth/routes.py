@@ -6,6 +6,8 @@ from auth.utils import (
     obtener_direccion_desde_coordenadas, usuario_tiene_sesion_activa
 )
 from models.user import Usuario
+from utils.limite_login import limitador_login, ip_cliente
+from utils.hash_password import HashSaturadoError
 import json
 import time
 import requests
@@ -136,6 +138,12 @@ def login():
             flash('Por favor ingresa un email válido', 'error')
             return render_template('login.html')
         
+        ip = ip_cliente()
+        espera = limitador_login.espera(email, ip)
+        if espera:
+            flash(f'Demasiados intentos fallidos. Intenta de nuevo en {espera} segundos.', 'error')
+            return render_template('login.html'), 429
+        
         try:
             sesion_activa = usuario_tiene_sesion_activa(email)
 
@@ -145,6 +153,7 @@ def login():
 
             usuario = Usuario.verificar_login(email, password)
             if usuario:
+                limitador_login.registrar_exito(email, ip)
                 if ubicacion_json:
                     try:
                         ubicacion = json.loads(ubicacion_json)
@@ -209,7 +218,11 @@ def login():
                     flash('Modo offline: Revisa la consola de tu navegador para obtener el código de verificación', 'warning')
                     return redirect(url_for('auth.verificar_2fa'))
             else:
+                limitador_login.registrar_fallo(email, ip)
                 flash('Email o contraseña incorrectos', 'error')
+        except HashSaturadoError:
+            flash('El servicio está ocupado en este momento. Intenta de nuevo en unos segundos.', 'warning')
+            return render_template('login.html'), 503
         except Exception as e:
             flash(f'Error al iniciar sesión: {str(e)}', 'error')
     
@@ -338,12 +351,7 @@ def olvide_contrasena():
             Equipo de Sistema de Seguridad
             """
             
-            try:
-                import socket
-                socket.create_connection(("8.8.8.8", 53), timeout=3)
-                tiene_conexion = True
-            except OSError:
-                tiene_conexion = False
+            tiene_conexion = verificar_conexion()
             
             if tiene_conexion:
                 if enviar_correo(email, asunto, cuerpo):
@@ -2,13 +2,51 @@ import random
 import string
 import requests
 import os
+import threading
+import time
 from datetime import datetime, timedelta
-from utils.database import get_connection
+from flask import has_app_context
+from sqlalchemy import text
+from utils.database import get_connection, liberar_unidad_de_trabajo
+from utils.plantillas_correo import envolver
+from utils.conectividad import monitor_conectividad
 
 # Configuración de Brevo (usando tus nombres de variables)
 BREVO_API_KEY = os.getenv('BREVO_API_KEY', '')
 BREVO_SENDER_EMAIL = os.getenv('FROM_EMAIL', 'noreply@tudominio.com')
 BREVO_SENDER_NAME = os.getenv('FROM_NAME', 'Sistema de Inventario')
+# Destinatarios por llamada a la API en los envíos por lote (una messageVersion por destinatario)
+BREVO_LOTE_MAX = int(os.getenv('BREVO_LOTE_MAX', 500))
+
+# Segundos que se reutiliza la lista de destinatarios de cada rol
+DESTINATARIOS_CACHE_TTL = int(os.getenv('DESTINATARIOS_CACHE_TTL', 300))
+
+_destinatarios_cache = {}  # (roles,) -> (expira, generación compartida, [correos])
+_destinatarios_generacion = [0]
+_destinatarios_lock = threading.Lock()
+
+_brevo = {'api': None, 'pid': None}
+_brevo_lock = threading.Lock()
+
+
+def _api_brevo():
+    """
+    Cliente de Brevo compartido por el proceso: el ApiClient mantiene su pool de
+    conexiones HTTP (keep-alive), así no se abre una sesión TLS por cada correo.
+    """
+    if _brevo['api'] is not None and _brevo['pid'] == os.getpid():
+        return _brevo['api']
+    
+    import sib_api_v3_sdk
+    
+    with _brevo_lock:
+        if _brevo['api'] is None or _brevo['pid'] != os.getpid():
+            configuration = sib_api_v3_sdk.Configuration()
+            configuration.api_key['api-key'] = BREVO_API_KEY
+            configuration.connection_pool_maxsize = int(os.getenv('BREVO_CONEXIONES', 10))
+            _brevo['api'] = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+            _brevo['pid'] = os.getpid()
+        return _brevo['api']
 
 
 def generar_codigo_verificacion(longitud=6):
@@ -27,11 +65,8 @@ def enviar_correo_brevo(destinatario, asunto, cuerpo_html):
         import sib_api_v3_sdk
         from sib_api_v3_sdk.rest import ApiException
         
-        # Configurar API
-        configuration = sib_api_v3_sdk.Configuration()
-        configuration.api_key['api-key'] = BREVO_API_KEY
-        
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        liberar_unidad_de_trabajo()
+        api_instance = _api_brevo()
         
         send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
             to=[{"email": destinatario}],
@@ -52,6 +87,58 @@ def enviar_correo_brevo(destinatario, asunto, cuerpo_html):
         return False
 
 
+def enviar_correo_brevo_lote(destinatarios, asunto, cuerpo_html):
+    """
+    Enviar el mismo correo a varios destinatarios con una llamada a la API por
+    cada BREVO_LOTE_MAX: cada destinatario va en su propia messageVersion, así
+    nadie ve las direcciones de los demás. Devuelve [(destinatario, exito), ...]
+    """
+    destinatarios = list(dict.fromkeys(d for d in destinatarios if d))
+    if not destinatarios:
+        return []
+    
+    if not BREVO_API_KEY:
+        print(f"📧 SIMULACIÓN (sin API key) - Para: {', '.join(destinatarios)}")
+        print(f"📧 Asunto: {asunto}")
+        return [(destinatario, True) for destinatario in destinatarios]
+    
+    try:
+        import sib_api_v3_sdk
+        from sib_api_v3_sdk.rest import ApiException
+    except ImportError as e:
+        print(f"❌ Error enviando correo por lote: {e}")
+        return [(destinatario, False) for destinatario in destinatarios]
+    
+    liberar_unidad_de_trabajo()
+    api_instance = _api_brevo()
+    resultados = []
+    
+    for inicio in range(0, len(destinatarios), BREVO_LOTE_MAX):
+        grupo = destinatarios[inicio:inicio + BREVO_LOTE_MAX]
+        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
+            sender={"name": BREVO_SENDER_NAME, "email": BREVO_SENDER_EMAIL},
+            subject=asunto,
+            html_content=cuerpo_html,
+            message_versions=[
+                sib_api_v3_sdk.SendSmtpEmailMessageVersions(to=[{"email": destinatario}])
+                for destinatario in grupo
+            ]
+        )
+        
+        try:
+            api_instance.send_transac_email(send_smtp_email)
+            print(f"✅ Correo enviado exitosamente a {len(grupo)} destinatario(s)")
+            resultados.extend((destinatario, True) for destinatario in grupo)
+        except ApiException as e:
+            print(f"❌ Error de Brevo API enviando lote de {len(grupo)}: {e}")
+            resultados.extend((destinatario, False) for destinatario in grupo)
+        except Exception as e:
+            print(f"❌ Error enviando lote de {len(grupo)} correos: {e}")
+            resultados.extend((destinatario, False) for destinatario in grupo)
+    
+    return resultados
+
+
 def enviar_correo(destinatario, asunto, cuerpo):
     """Enviar correo electrónico (wrapper para compatibilidad)"""
     # Convertir texto plano a HTML básico si es necesario
@@ -66,59 +153,113 @@ def enviar_correo(destinatario, asunto, cuerpo):
 def enviar_notificacion_inventario(destinatario, asunto, cuerpo, tipo_notificacion="inventario"):
     """Enviar notificación de inventario por correo con plantilla mejorada"""
     try:
-        # Plantilla HTML mejorada para notificaciones
-        cuerpo_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #f8f9fa; padding: 20px; text-align: center; border-radius: 5px; }}
-                .content {{ background: white; padding: 20px; border: 1px solid #ddd; border-radius: 5px; }}
-                .footer {{ text-align: center; margin-top: 20px; font-size: 12px; color: #666; }}
-                .alert {{ background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; }}
-                .success {{ background: #d1edff; border: 1px solid #b3d7ff; padding: 15px; border-radius: 5px; }}
-                .warning {{ background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; }}
-                .danger {{ background: #f8d7da; border: 1px solid #f5c6cb; padding: 15px; border-radius: 5px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>🔔 Sistema de Inventario - Notificación</h2>
-                </div>
-                <div class="content">
-                    {cuerpo}
-                </div>
-                <div class="footer">
-                    <p>Este es un mensaje automático del Sistema de Inventario.</p>
-                    <p>© {datetime.now().year} Sistema de Seguridad</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return enviar_correo_brevo(destinatario, asunto, cuerpo_html)
+        return enviar_correo_brevo(destinatario, asunto, envolver(cuerpo))
         
     except Exception as e:
         print(f"❌ Error enviando notificación a {destinatario}: {e}")
         return False
 
 
-def obtener_correos_administradores():
-    """Obtener lista de correos de administradores para notificaciones"""
+def enviar_notificacion_inventario_lote(destinatarios, asunto, cuerpo, tipo_notificacion="inventario"):
+    """Enviar la misma notificación a varios destinatarios en un solo envío por lote"""
+    try:
+        return enviar_correo_brevo_lote(destinatarios, asunto, envolver(cuerpo))
+        
+    except Exception as e:
+        print(f"❌ Error enviando notificación por lote: {e}")
+        return [(destinatario, False) for destinatario in destinatarios]
+
+
+def _consultar_correos(roles):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        marcadores = ', '.join(['%s'] * len(roles))
+        cursor.execute(
+            f"SELECT email FROM usuarios WHERE rol IN ({marcadores}) AND email IS NOT NULL",
+            tuple(roles)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _engine_postgres():
+    from models import db
+    engine = db.engine
+    return engine if engine.dialect.name == 'postgresql' else None
+
+
+def _generacion_compartida():
+    """Valor actual de destinatarios_generacion_seq (None en SQLite o si no se pudo leer)"""
     try:
+        engine = _engine_postgres()
+        if engine is None:
+            return None
+        with engine.connect() as conn:
+            fila = conn.execute(text('SELECT last_value, is_called FROM destinatarios_generacion_seq')).one()
+        return fila.last_value if fila.is_called else 0
+    except Exception as e:
+        print(f"⚠️ No se pudo leer la generación de destinatarios: {e}")
+        return None
+
+
+def obtener_correos_de_roles(*roles):
+    """
+    Correos de los usuarios con alguno de los roles, cacheados DESTINATARIOS_CACHE_TTL
+    segundos por proceso. Cada lectura compara la generación compartida en
+    PostgreSQL, que Usuario.crear/actualizar/eliminar suben en cualquier worker.
+    """
+    if not has_app_context():
         from app_simple import app
         with app.app_context():
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT email FROM usuarios WHERE rol = 'admin' AND email IS NOT NULL")
-            administradores = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conn.close()
-            return administradores
+            return obtener_correos_de_roles(*roles)
+    
+    clave = tuple(sorted(roles))
+    ahora = time.monotonic()
+    compartida = _generacion_compartida()
+    with _destinatarios_lock:
+        guardado = _destinatarios_cache.get(clave)
+        if guardado and guardado[0] > ahora and guardado[1] == compartida:
+            return list(guardado[2])
+        generacion = _destinatarios_generacion[0]
+    
+    correos = _consultar_correos(clave)
+    
+    with _destinatarios_lock:
+        # Si se invalidó mientras consultábamos, no guardar un resultado posiblemente viejo
+        if generacion == _destinatarios_generacion[0]:
+            _destinatarios_cache[clave] = (ahora + DESTINATARIOS_CACHE_TTL, compartida, correos)
+    return list(correos)
+
+
+def invalidar_cache_destinatarios():
+    """
+    Olvidar las listas de destinatarios (tras cambiar roles o correos de usuarios).
+    Se llama después del commit: sube la generación compartida en una conexión
+    propia para que los demás workers vuelvan a consultar en su próxima lectura.
+    """
+    with _destinatarios_lock:
+        _destinatarios_cache.clear()
+        _destinatarios_generacion[0] += 1
+    
+    try:
+        engine = _engine_postgres() if has_app_context() else None
+        if engine is not None:
+            from models.user import destinatarios_generacion_seq
+            with engine.connect() as conn:
+                conn.execute(destinatarios_generacion_seq.next_value())
+                conn.commit()
+    except Exception as e:
+        # Los demás workers verán el cambio al vencer DESTINATARIOS_CACHE_TTL
+        print(f"❌ Error subiendo la generación de destinatarios: {e}")
+
+
+def obtener_correos_administradores():
+    """Obtener lista de correos de administradores para notificaciones"""
+    try:
+        return obtener_correos_de_roles('admin')
     except Exception as e:
         print(f"Error obteniendo correos de administradores: {e}")
         return []
@@ -127,15 +268,7 @@ def obtener_correos_administradores():
 def obtener_correos_editores():
     """Obtener lista de correos de editores para notificaciones"""
     try:
-        from app_simple import app
-        with app.app_context():
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT email FROM usuarios WHERE rol IN ('admin', 'editor') AND email IS NOT NULL")
-            editores = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conn.close()
-            return editores
+        return obtener_correos_de_roles('admin', 'editor')
     except Exception as e:
         print(f"Error obteniendo correos de editores: {e}")
         return []
@@ -183,8 +316,8 @@ def enviar_notificacion_masiva(destinatarios, asunto, cuerpo, tipo_notificacion=
     
     print(f"📧 Iniciando envío masivo a {len(destinatarios)} destinatario(s)...")
     
-    for destinatario in destinatarios:
-        if enviar_notificacion_inventario(destinatario, asunto, cuerpo, tipo_notificacion):
+    for _, exito in enviar_notificacion_inventario_lote(destinatarios, asunto, cuerpo, tipo_notificacion):
+        if exito:
             exitosos += 1
         else:
             fallidos += 1
@@ -194,12 +327,8 @@ def enviar_notificacion_masiva(destinatarios, asunto, cuerpo, tipo_notificacion=
 
 
 def verificar_conexion():
-    """Verificar si hay conexión a internet"""
-    try:
-        response = requests.get("https://www.google.com", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+    """Verificar si hay conexión a internet (último resultado del monitor en segundo plano)"""
+    return monitor_conectividad.online
 
 
 def obtener_direccion_desde_coordenadas(lat, lon):
@@ -208,6 +337,7 @@ def obtener_direccion_desde_coordenadas(lat, lon):
         url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=18&addressdetails=1"
         headers = {'User-Agent': 'SistemaSeguridadApp/1.0'}
         
+        liberar_unidad_de_trabajo()
         response = requests.get(url, headers=headers, timeout=10)
         
         if response.status_code == 200:
@@ -0,0 +1,49 @@
+# benchmarks/bench_plantillas_correo.py - COSTO DE ARMAR UN CORREO DE INVENTARIO
+# Uso: python benchmarks/bench_plantillas_correo.py [--repeticiones 500]
+# Compara utils.plantillas_correo (plantillas compiladas una vez y base partida en dos)
+# con compilar el cuerpo y la base en cada correo, usando el aviso de salida de inventario.
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.plantillas_correo import DIRECTORIO_PLANTILLAS, envolver, renderizar
+
+CONTEXTO = {
+    'movimiento': {'Cantidad': 3, 'Referencia_Documento': 'FAC-001'},
+    'producto': {'Nombre': 'Tornillo <M6>', 'Codigo': 'P001', 'Unidad': 'pz', 'Stock_Actual': 4, 'Stock_Minimo': 5},
+    'usuario_responsable': 'Admin',
+    'nuevo_stock': 4,
+}
+
+
+def precompilado():
+    return envolver(renderizar('salida_inventario.html', **CONTEXTO))
+
+
+def compilando_cada_vez():
+    entorno = Environment(loader=FileSystemLoader(DIRECTORIO_PLANTILLAS), autoescape=select_autoescape(['html']),
+                          trim_blocks=True, lstrip_blocks=True)
+    fecha = datetime.now().strftime('%d/%m/%Y %H:%M')
+    cuerpo = entorno.get_template('salida_inventario.html').render(fecha=fecha, **CONTEXTO)
+    return entorno.get_template('base.html').render(contenido=cuerpo, anio=datetime.now().year)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark de las plantillas de correo')
+    parser.add_argument('--repeticiones', type=int, default=500)
+    args = parser.parse_args()
+    
+    print(f"{'variante':<22} {'µs por correo':>14}")
+    for nombre, funcion in [('precompiladas', precompilado), ('compilando cada vez', compilando_cada_vez)]:
+        mejor = min(timeit.repeat(funcion, number=args.repeticiones, repeat=5))
+        print(f"{nombre:<22} {mejor / args.repeticiones * 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,103 @@
 # controllers/inventario_controller.py - VERSIÓN MEJORADA CON MANEJO SEGURO DE HILOS
 
-from flask import request, jsonify, session
-from models import db, Producto, Movimiento, Proveedor, Cliente
+from flask import request, jsonify, session, g
+import json
+import os
+from models import db, Producto, Movimiento, Proveedor, Cliente, VersionCatalogo, NotificacionOutbox, EstadoAlertaStock
+from sqlalchemy import and_, or_, func, select, insert, delete
 from sqlalchemy.exc import SQLAlchemyError
-from utils.notifications import NotificacionesInventario
-import threading
+from datetime import datetime, timedelta
+from utils.eventos import publicar_evento
+from utils.importacion import IMPORTACION_LOTE, detectar_formato, leer_filas, importar_productos
 
-def ejecutar_notificacion_segura(func, *args):
-    """Ejecutar notificación en un hilo con contexto de aplicación"""
-    def notificacion_con_contexto():
+# Tamaño máximo de página para /productos?limit=
+LIMITE_MAXIMO_PRODUCTOS = 500
+
+# Líneas máximas por POST /movimientos/lote
+LIMITE_MOVIMIENTOS_LOTE = 1000
+
+# Minutos antes de volver a avisar el mismo estado de alerta de un producto (evita avisos por vaivén)
+ALERTAS_ENFRIAMIENTO = timedelta(minutes=int(os.getenv('ALERTAS_ENFRIAMIENTO_MINUTOS', 60)))
+GRAVEDAD_ALERTA = {'normal': 0, 'bajo': 1, 'agotado': 2}
+
+# Acciones permitidas por rol. PERMISOS_ROLES (JSON {"rol": ["accion", ...]}) agrega
+# roles nuevos o reemplaza los de aquí sin tocar el código
+PERMISOS_POR_ROL = {
+    'lector': ['ver_productos', 'ver_reportes', 'ver_alertas'],
+    'editor': ['ver_productos', 'ver_reportes', 'ver_alertas', 
+              'crear_productos', 'editar_descripcion', 'editar_categoria',
+              'registrar_entradas', 'registrar_salidas', 
+              'crear_clientes', 'crear_proveedores'],
+    'admin': ['ver_productos', 'ver_reportes', 'ver_alertas',
+             'crear_productos', 'editar_descripcion', 'editar_categoria',
+             'editar_codigo', 'editar_nombre', 'editar_unidad',
+             'editar_stock', 'desactivar_productos', 'eliminar_productos',
+             'importar_productos',
+             'registrar_entradas', 'registrar_salidas',
+             'crear_clientes', 'crear_proveedores']
+}
+
+def _compilar_permisos():
+    """Matriz de permisos como frozenset por rol, calculada una sola vez al importar"""
+    permisos = dict(PERMISOS_POR_ROL)
+    configurados = os.getenv('PERMISOS_ROLES')
+    if configurados:
         try:
-            from app_simple import app
-            with app.app_context():
-                func(*args)
-        except Exception as e:
-            print(f"❌ Error en notificación en hilo: {e}")
+            extra = json.loads(configurados)
+            if not isinstance(extra, dict) or not all(isinstance(acciones, list) for acciones in extra.values()):
+                raise ValueError('se esperaba {"rol": ["accion", ...]}')
+            permisos.update(extra)
+        except ValueError as e:
+            print(f"⚠️ PERMISOS_ROLES inválido, se usa la matriz por defecto: {e}")
+    return {rol: frozenset(acciones) for rol, acciones in permisos.items()}
+
+PERMISOS_COMPILADOS = _compilar_permisos()
+
+def es_entero_positivo(valor):
+    """Entero JSON mayor que cero (True/False no cuentan aunque sean int en Python)"""
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor > 0
+
+def publicar_cambio_producto(producto_dict):
+    """Avisar a los tableros conectados (/stream) del nuevo estado de un producto"""
+    publicar_evento('producto', producto_dict)
+    
+    if producto_dict['Activo'] and producto_dict['Stock_Actual'] < (producto_dict['Stock_Minimo'] or 0):
+        publicar_evento('alerta', {
+            **producto_dict,
+            'diferencia': producto_dict['Stock_Minimo'] - producto_dict['Stock_Actual'],
+            'alerta': 'Stock crítico' if producto_dict['Stock_Actual'] == 0 else 'Stock bajo'
+        })
+
+def evaluar_alerta_stock(producto_dict):
+    """
+    Registrar en la transacción en curso el estado de alerta del producto y,
+    solo si cambió a bajo o agotado, encolar el aviso en el outbox. Dentro de
+    ALERTAS_ENFRIAMIENTO desde el último aviso solo se avisa si el estado es
+    más grave que el ya avisado (p. ej. bajo → agotado).
+    """
+    estado_nuevo = EstadoAlertaStock.calcular(producto_dict)
+    registro = db.session.get(EstadoAlertaStock, producto_dict['ID_Producto'], with_for_update=True)
+    if registro is None:
+        registro = EstadoAlertaStock(ID_Producto=producto_dict['ID_Producto'], Estado='normal')
+        db.session.add(registro)
+    
+    if registro.Estado == estado_nuevo:
+        return
+    registro.Estado = estado_nuevo
     
-    thread = threading.Thread(target=notificacion_con_contexto)
-    thread.daemon = True
-    thread.start()
+    if estado_nuevo == 'normal':
+        return
+    ahora = datetime.utcnow()
+    en_enfriamiento = registro.Fecha_Notificacion and ahora - registro.Fecha_Notificacion < ALERTAS_ENFRIAMIENTO
+    if en_enfriamiento and GRAVEDAD_ALERTA[estado_nuevo] <= GRAVEDAD_ALERTA.get(registro.Estado_Notificado, 0):
+        return
+    
+    registro.Estado_Notificado = estado_nuevo
+    registro.Fecha_Notificacion = ahora
+    NotificacionOutbox.registrar(
+        'notificar_stock_agotado' if estado_nuevo == 'agotado' else 'notificar_stock_bajo',
+        producto_dict
+    )
 
 class InventarioController:
     
@@ -26,24 +105,14 @@ class InventarioController:
     
     @staticmethod
     def _tiene_permiso(accion_requerida):
-        """Validar permisos según el rol del usuario"""
+        """Validar permisos según el rol del usuario (conjunto del rol memorizado por petición)"""
         rol = session.get('user_rol', 'lector')
         
-        permisos = {
-            'lector': ['ver_productos', 'ver_reportes', 'ver_alertas'],
-            'editor': ['ver_productos', 'ver_reportes', 'ver_alertas', 
-                      'crear_productos', 'editar_descripcion', 'editar_categoria',
-                      'registrar_entradas', 'registrar_salidas', 
-                      'crear_clientes', 'crear_proveedores'],
-            'admin': ['ver_productos', 'ver_reportes', 'ver_alertas',
-                     'crear_productos', 'editar_descripcion', 'editar_categoria',
-                     'editar_codigo', 'editar_nombre', 'editar_unidad',
-                     'editar_stock', 'desactivar_productos', 'eliminar_productos',
-                     'registrar_entradas', 'registrar_salidas',
-                     'crear_clientes', 'crear_proveedores']
-        }
+        memo = g.get('_permisos_rol')
+        if not memo or memo[0] != rol:
+            memo = g._permisos_rol = (rol, PERMISOS_COMPILADOS.get(rol, frozenset()))
         
-        return accion_requerida in permisos.get(rol, [])
+        return accion_requerida in memo[1]
     
     @staticmethod
     def _validar_permiso_o_denegar(accion_requerida):
@@ -56,24 +125,107 @@ class InventarioController:
     
     # ===== ENDPOINTS DE PRODUCTOS =====
     
+    @staticmethod
+    def _filtrar_productos(query):
+        """Aplicar los filtros de la petición (estado, categoria, buscar, stock) a una consulta de productos"""
+        estado = request.args.get('estado', 'activo')  # Por defecto solo activos
+        categoria = request.args.get('categoria')
+        buscar = request.args.get('buscar', '').strip()
+        stock = request.args.get('stock')
+        
+        if estado == 'activo':
+            query = query.filter(Producto.Activo == True)
+        elif estado == 'inactivo':
+            query = query.filter(Producto.Activo == False)
+        # 'todos': sin filtro de estado
+        
+        if categoria:
+            query = query.filter(Producto.Categoria == categoria)
+        
+        if buscar:
+            patron = f'%{buscar}%'
+            query = query.filter(or_(
+                Producto.Codigo.ilike(patron),
+                Producto.Nombre.ilike(patron),
+                Producto.Descripcion.ilike(patron)
+            ))
+        
+        # El filtro de stock solo aplica a productos activos (los inactivos se muestran siempre)
+        if stock == 'bajo':
+            query = query.filter(or_(
+                Producto.Activo == False,
+                and_(Producto.Stock_Actual > 0, Producto.Stock_Actual < Producto.Stock_Minimo)
+            ))
+        elif stock == 'normal':
+            query = query.filter(or_(Producto.Activo == False, Producto.Stock_Actual >= Producto.Stock_Minimo))
+        elif stock == 'sin':
+            query = query.filter(or_(Producto.Activo == False, Producto.Stock_Actual <= 0))
+        
+        return query
+    
     @staticmethod
     def obtener_productos():
-        """Obtener lista de productos - Permitido para todos los roles"""
+        """
+        Obtener lista de productos - Permitido para todos los roles.
+        
+        Paginación por cursor (keyset): ?limit=N&after=<cursor>, ordenado por
+        ID_Producto (o por Codigo con ?orden=codigo). El total filtrado va en
+        X-Total-Count (solo en la primera página) y el cursor de la siguiente
+        página en X-Next-Cursor. Sin ?limit se devuelve la lista completa.
+        """
         try:
-            # Obtener parámetros de filtro
-            estado = request.args.get('estado', 'activo')  # Por defecto solo activos
-            
-            if estado == 'activo':
-                productos = Producto.query.filter_by(Activo=True).all()
-            elif estado == 'inactivo':
-                productos = Producto.query.filter_by(Activo=False).all()
-            else:  # 'todos'
-                productos = Producto.query.all()
-                
-            return jsonify([producto.to_dict() for producto in productos]), 200
+            limit = request.args.get('limit', type=int)
+            after = request.args.get('after')
+            orden = request.args.get('orden', 'id')
+            
+            query = InventarioController._filtrar_productos(Producto.query)
+            
+            total = None
+            if not after:
+                # Conteo sin ORDER BY ni serialización: una sola fila
+                total = query.with_entities(func.count(Producto.ID_Producto)).scalar()
+            
+            columna = Producto.Codigo if orden == 'codigo' else Producto.ID_Producto
+            if after:
+                if orden == 'codigo':
+                    query = query.filter(Producto.Codigo > after)
+                else:
+                    try:
+                        query = query.filter(Producto.ID_Producto > int(after))
+                    except ValueError:
+                        return jsonify({'error': 'Cursor inválido'}), 400
+            query = query.order_by(columna)
+            
+            if limit is not None:
+                limit = max(1, min(limit, LIMITE_MAXIMO_PRODUCTOS))
+                productos = query.limit(limit + 1).all()
+                hay_mas = len(productos) > limit
+                productos = productos[:limit]
+            else:
+                productos = query.all()
+                hay_mas = False
+            
+            response = jsonify([producto.to_dict() for producto in productos])
+            if total is not None:
+                response.headers['X-Total-Count'] = str(total)
+            if hay_mas:
+                ultimo = productos[-1]
+                response.headers['X-Next-Cursor'] = str(ultimo.Codigo if orden == 'codigo' else ultimo.ID_Producto)
+            return response, 200
         except SQLAlchemyError as e:
             return jsonify({'error': 'Error al obtener productos'}), 500
     
+    @staticmethod
+    def obtener_categorias():
+        """Obtener las categorías distintas de los productos - Permitido para todos los roles"""
+        try:
+            filas = db.session.query(Producto.Categoria).filter(
+                Producto.Categoria.isnot(None), Producto.Categoria != ''
+            ).distinct().order_by(Producto.Categoria).all()
+            return jsonify([fila[0] for fila in filas]), 200
+        except SQLAlchemyError as e:
+            return jsonify({'error': 'Error al obtener categorías'}), 500
+    
     @staticmethod
     def crear_producto():
         """Crear nuevo producto - Solo editores y admins"""
@@ -106,21 +258,24 @@ class InventarioController:
             )
             
             db.session.add(producto)
-            db.session.commit()
+            db.session.flush()
             
-            # 🔔 ENVIAR NOTIFICACIÓN POR CORREO - NUEVO PRODUCTO
+            # 🔔 NOTIFICACIÓN POR CORREO - NUEVO PRODUCTO (outbox, misma transacción)
             producto_dict = producto.to_dict()
             usuario_creador = session.get('user_nombre', 'Usuario del sistema')
-            
-            # Enviar notificación en segundo plano con contexto seguro
-            ejecutar_notificacion_segura(
-                NotificacionesInventario.notificar_nuevo_producto,
-                producto_dict, usuario_creador
+            NotificacionOutbox.registrar(
+                'notificar_nuevo_producto', producto_dict, usuario_creador,
+                clave=f"nuevo_producto:{producto.ID_Producto}"
             )
+            evaluar_alerta_stock(producto_dict)
+            
+            VersionCatalogo.incrementar()
+            db.session.commit()
+            publicar_cambio_producto(producto_dict)
             
             return jsonify({
                 'success': True,
-                'producto': producto.to_dict(),
+                'producto': producto_dict,
                 'message': 'Producto creado exitosamente'
             }), 201
             
@@ -128,6 +283,42 @@ class InventarioController:
             db.session.rollback()
             return jsonify({'error': 'Error al crear producto'}), 500
     
+    @staticmethod
+    def importar_productos():
+        """
+        Importar productos desde CSV o NDJSON - Solo admins.
+        
+        Acepta un archivo multipart ('archivo') o el cuerpo crudo con Content-Type
+        text/csv o application/x-ndjson (?formato=csv|ndjson para forzarlo). Los
+        códigos existentes se actualizan; los errores se informan por fila.
+        """
+        error_resp = InventarioController._validar_permiso_o_denegar('importar_productos')
+        if error_resp:
+            return error_resp
+        
+        archivo = request.files.get('archivo')
+        if archivo:
+            flujo, nombre = archivo.stream, archivo.filename
+        else:
+            flujo, nombre = request.stream, None
+        
+        formato = request.args.get('formato') or detectar_formato(nombre, request.content_type)
+        if formato not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Formato no soportado (csv o ndjson)'}), 400
+        
+        try:
+            tamano_lote = min(max(int(request.args.get('lote', IMPORTACION_LOTE)), 1), 5000)
+        except ValueError:
+            return jsonify({'error': 'El parámetro lote debe ser un número'}), 400
+        
+        resumen = importar_productos(leer_filas(flujo, formato), tamano_lote)
+        
+        return jsonify({
+            'success': resumen['total_errores'] == 0,
+            **resumen,
+            'message': f"{resumen['importadas']} productos importados, {resumen['total_errores']} filas con error"
+        }), 200
+    
     @staticmethod
     def actualizar_producto(producto_id):
         """Actualizar producto con validación de permisos por campo"""
@@ -169,10 +360,15 @@ class InventarioController:
                 campos_actualizados.append('Stock_Minimo')
             
             if campos_actualizados:
+                db.session.flush()
+                producto_dict = producto.to_dict()
+                evaluar_alerta_stock(producto_dict)
+                VersionCatalogo.incrementar()
                 db.session.commit()
+                publicar_cambio_producto(producto_dict)
                 return jsonify({
                     'success': True,
-                    'producto': producto.to_dict(),
+                    'producto': producto_dict,
                     'campos_actualizados': campos_actualizados,
                     'message': 'Producto actualizado exitosamente'
                 }), 200
@@ -199,7 +395,11 @@ class InventarioController:
             
             # CORRECCIÓN: Cambiar Activo a False en lugar de eliminar
             producto.Activo = False
+            producto_dict = producto.to_dict()
+            evaluar_alerta_stock(producto_dict)
+            VersionCatalogo.incrementar()
             db.session.commit()
+            publicar_cambio_producto(producto_dict)
             
             return jsonify({
                 'success': True,
@@ -223,7 +423,11 @@ class InventarioController:
                 return jsonify({'error': 'Producto no encontrado'}), 404
             
             producto.Activo = True
+            producto_dict = producto.to_dict()
+            evaluar_alerta_stock(producto_dict)
+            VersionCatalogo.incrementar()
             db.session.commit()
+            publicar_cambio_producto(producto_dict)
             
             return jsonify({
                 'success': True,
@@ -254,7 +458,10 @@ class InventarioController:
                 }), 400
             
             db.session.delete(producto)
+            db.session.execute(delete(EstadoAlertaStock).where(EstadoAlertaStock.ID_Producto == producto_id))
+            VersionCatalogo.incrementar()
             db.session.commit()
+            publicar_evento('producto_eliminado', {'ID_Producto': producto_id})
             
             return jsonify({
                 'success': True,
@@ -282,12 +489,14 @@ class InventarioController:
                 if field not in data or not data[field]:
                     return jsonify({'error': f'El campo {field} es requerido'}), 400
             
-            producto = Producto.query.get(data['ID_Producto'])
-            if not producto:
-                return jsonify({'error': 'Producto no encontrado'}), 404
+            if not es_entero_positivo(data['Cantidad']):
+                return jsonify({'error': 'Cantidad debe ser un entero positivo'}), 400
             
-            # Guardar stock anterior para la notificación
-            stock_anterior = producto.Stock_Actual
+            # Actualizar stock en un solo UPDATE atómico (sin leer-modificar-escribir)
+            nuevo_stock = Producto.ajustar_stock(data['ID_Producto'], data['Cantidad'])
+            if nuevo_stock is None:
+                db.session.rollback()
+                return jsonify({'error': 'Producto no encontrado'}), 404
             
             movimiento = Movimiento(
                 Tipo='Entrada',
@@ -298,27 +507,28 @@ class InventarioController:
                 ID_Proveedor=data.get('ID_Proveedor')
             )
             
-            # Actualizar stock
-            producto.Stock_Actual += data['Cantidad']
-            nuevo_stock = producto.Stock_Actual
-            
             db.session.add(movimiento)
-            db.session.commit()
+            db.session.flush()
             
-            # 🔔 ENVIAR NOTIFICACIÓN POR CORREO - ENTRADA
+            # 🔔 NOTIFICACIÓN POR CORREO - ENTRADA (outbox, misma transacción)
+            producto = db.session.get(Producto, data['ID_Producto'])
             movimiento_dict = movimiento.to_dict()
             producto_dict = producto.to_dict()
             usuario_responsable = data['Responsable']
-            
-            # Enviar notificación en segundo plano con contexto seguro
-            ejecutar_notificacion_segura(
-                NotificacionesInventario.notificar_entrada_inventario,
-                movimiento_dict, producto_dict, usuario_responsable, nuevo_stock
+            NotificacionOutbox.registrar(
+                'notificar_entrada_inventario',
+                movimiento_dict, producto_dict, usuario_responsable, nuevo_stock,
+                clave=f"entrada:{movimiento.ID_Movimiento}"
             )
+            evaluar_alerta_stock(producto_dict)
+            
+            VersionCatalogo.incrementar()
+            db.session.commit()
+            publicar_cambio_producto(producto_dict)
             
             return jsonify({
                 'success': True,
-                'movimiento': movimiento.to_dict(),
+                'movimiento': movimiento_dict,
                 'nuevo_stock': nuevo_stock,
                 'message': 'Entrada registrada exitosamente'
             }), 201
@@ -342,16 +552,18 @@ class InventarioController:
                 if field not in data or not data[field]:
                     return jsonify({'error': f'El campo {field} es requerido'}), 400
             
-            producto = Producto.query.get(data['ID_Producto'])
-            if not producto:
-                return jsonify({'error': 'Producto no encontrado'}), 404
+            if not es_entero_positivo(data['Cantidad']):
+                return jsonify({'error': 'Cantidad debe ser un entero positivo'}), 400
             
-            if producto.Stock_Actual < data['Cantidad']:
+            # Descontar solo si alcanza el stock: la condición va en el mismo UPDATE,
+            # así dos salidas concurrentes no pueden sobrevender
+            nuevo_stock = Producto.ajustar_stock(data['ID_Producto'], -data['Cantidad'])
+            if nuevo_stock is None:
+                db.session.rollback()
+                if not db.session.get(Producto, data['ID_Producto']):
+                    return jsonify({'error': 'Producto no encontrado'}), 404
                 return jsonify({'error': 'Stock insuficiente'}), 400
             
-            # Guardar stock anterior para la notificación
-            stock_anterior = producto.Stock_Actual
-            
             movimiento = Movimiento(
                 Tipo='Salida',
                 ID_Producto=data['ID_Producto'],
@@ -361,37 +573,30 @@ class InventarioController:
                 ID_Cliente=data.get('ID_Cliente')
             )
             
-            # Actualizar stock
-            producto.Stock_Actual -= data['Cantidad']
-            nuevo_stock = producto.Stock_Actual
-            
             db.session.add(movimiento)
-            db.session.commit()
+            db.session.flush()
             
-            # 🔔 ENVIAR NOTIFICACIÓN POR CORREO - SALIDA
+            # 🔔 NOTIFICACIÓN POR CORREO - SALIDA (outbox, misma transacción)
+            producto = db.session.get(Producto, data['ID_Producto'])
             movimiento_dict = movimiento.to_dict()
             producto_dict = producto.to_dict()
             usuario_responsable = data['Responsable']
-            
-            # Verificar si el producto se agotó después de la salida
-            producto_agotado = nuevo_stock == 0
-            
-            # Enviar notificación de salida en segundo plano con contexto seguro
-            ejecutar_notificacion_segura(
-                NotificacionesInventario.notificar_salida_inventario,
-                movimiento_dict, producto_dict, usuario_responsable, nuevo_stock
+            NotificacionOutbox.registrar(
+                'notificar_salida_inventario',
+                movimiento_dict, producto_dict, usuario_responsable, nuevo_stock,
+                clave=f"salida:{movimiento.ID_Movimiento}"
             )
             
-            # 🔔 NOTIFICACIÓN ADICIONAL SI EL PRODUCTO SE AGOTÓ
-            if producto_agotado:
-                ejecutar_notificacion_segura(
-                    NotificacionesInventario.notificar_stock_agotado,
-                    producto_dict
-                )
+            # 🔔 NOTIFICACIÓN ADICIONAL SI EL PRODUCTO PASÓ A BAJO O AGOTADO
+            evaluar_alerta_stock(producto_dict)
+            
+            VersionCatalogo.incrementar()
+            db.session.commit()
+            publicar_cambio_producto(producto_dict)
             
             return jsonify({
                 'success': True,
-                'movimiento': movimiento.to_dict(),
+                'movimiento': movimiento_dict,
                 'nuevo_stock': nuevo_stock,
                 'message': 'Salida registrada exitosamente'
             }), 201
@@ -400,6 +605,125 @@ class InventarioController:
             db.session.rollback()
             return jsonify({'error': 'Error al registrar salida'}), 500
     
+    @staticmethod
+    def registrar_movimientos_lote():
+        """
+        Registrar un lote de entradas y salidas en una sola transacción - Editores y admins.
+        
+        Body: lista de movimientos (o {"movimientos": [...]}) con Tipo ('Entrada' o
+        'Salida'), ID_Producto, Cantidad, Responsable y opcionalmente
+        Referencia_Documento, ID_Proveedor e ID_Cliente. Si una línea es inválida o
+        algún producto no tiene stock suficiente no se aplica ninguna.
+        """
+        data = request.get_json(silent=True)
+        lineas = data.get('movimientos') if isinstance(data, dict) else data
+        if not isinstance(lineas, list) or not lineas:
+            return jsonify({'error': 'Se requiere una lista de movimientos'}), 400
+        if len(lineas) > LIMITE_MOVIMIENTOS_LOTE:
+            return jsonify({'error': f'El lote admite como máximo {LIMITE_MOVIMIENTOS_LOTE} movimientos'}), 400
+        
+        # Validar todas las líneas antes de tocar la base de datos
+        errores = []
+        for indice, linea in enumerate(lineas):
+            if not isinstance(linea, dict):
+                errores.append({'linea': indice, 'error': 'Formato inválido'})
+                continue
+            for field in ['Tipo', 'ID_Producto', 'Cantidad', 'Responsable']:
+                if field not in linea or not linea[field]:
+                    errores.append({'linea': indice, 'error': f'El campo {field} es requerido'})
+                    break
+            else:
+                if linea['Tipo'] not in ('Entrada', 'Salida'):
+                    errores.append({'linea': indice, 'error': 'Tipo debe ser Entrada o Salida'})
+                elif not es_entero_positivo(linea['ID_Producto']):
+                    # "1" como texto nunca coincidiría con los IDs enteros de la base de datos
+                    errores.append({'linea': indice, 'error': 'ID_Producto debe ser un entero positivo'})
+                elif not es_entero_positivo(linea['Cantidad']):
+                    errores.append({'linea': indice, 'error': 'Cantidad debe ser un entero positivo'})
+        if errores:
+            return jsonify({'error': 'Lote inválido', 'errores': errores}), 400
+        
+        tipos = {linea['Tipo'] for linea in lineas}
+        for tipo, accion in (('Entrada', 'registrar_entradas'), ('Salida', 'registrar_salidas')):
+            if tipo in tipos:
+                error_resp = InventarioController._validar_permiso_o_denegar(accion)
+                if error_resp:
+                    return error_resp
+        
+        # Variación neta de stock por producto: un UPDATE por producto, no por línea
+        variaciones = {}
+        for linea in lineas:
+            signo = 1 if linea['Tipo'] == 'Entrada' else -1
+            variaciones[linea['ID_Producto']] = variaciones.get(linea['ID_Producto'], 0) + signo * linea['Cantidad']
+        
+        try:
+            existentes = set(db.session.execute(
+                select(Producto.ID_Producto).where(Producto.ID_Producto.in_(variaciones))
+            ).scalars())
+            faltantes = [producto_id for producto_id in variaciones if producto_id not in existentes]
+            if faltantes:
+                return jsonify({'error': 'Producto no encontrado', 'productos': faltantes}), 404
+            
+            # Siempre en orden de ID: dos lotes con los mismos productos toman los bloqueos
+            # de fila en el mismo orden y no se bloquean mutuamente
+            insuficientes = []
+            for producto_id, variacion in sorted(variaciones.items()):
+                if variacion and Producto.ajustar_stock(producto_id, variacion) is None:
+                    insuficientes.append(producto_id)
+            if insuficientes:
+                db.session.rollback()
+                return jsonify({'error': 'Stock insuficiente', 'productos': insuficientes}), 400
+            
+            # INSERT masivo de todas las líneas
+            db.session.execute(insert(Movimiento), [{
+                'Tipo': linea['Tipo'],
+                'ID_Producto': linea['ID_Producto'],
+                'Cantidad': linea['Cantidad'],
+                'Referencia_Documento': linea.get('Referencia_Documento'),
+                'Responsable': linea['Responsable'],
+                'ID_Proveedor': linea.get('ID_Proveedor') if linea['Tipo'] == 'Entrada' else None,
+                'ID_Cliente': linea.get('ID_Cliente') if linea['Tipo'] == 'Salida' else None
+            } for linea in lineas])
+            
+            productos = Producto.query.filter(Producto.ID_Producto.in_(variaciones)).all()
+            productos_dict = [producto.to_dict() for producto in productos]
+            
+            resumen = {
+                'entradas': sum(1 for linea in lineas if linea['Tipo'] == 'Entrada'),
+                'salidas': sum(1 for linea in lineas if linea['Tipo'] == 'Salida'),
+                'productos': [{
+                    **producto_dict,
+                    'variacion': variaciones[producto_dict['ID_Producto']]
+                } for producto_dict in productos_dict]
+            }
+            
+            # 🔔 UNA SOLA NOTIFICACIÓN PARA TODO EL LOTE (outbox, misma transacción)
+            responsables = sorted({linea['Responsable'] for linea in lineas})
+            NotificacionOutbox.registrar('notificar_lote_movimientos', resumen, ', '.join(responsables))
+            for producto_dict in productos_dict:
+                evaluar_alerta_stock(producto_dict)
+            
+            VersionCatalogo.incrementar()
+            db.session.commit()
+            for producto_dict in productos_dict:
+                publicar_cambio_producto(producto_dict)
+            
+            return jsonify({
+                'success': True,
+                'total': len(lineas),
+                'entradas': resumen['entradas'],
+                'salidas': resumen['salidas'],
+                'productos': [{
+                    'ID_Producto': producto_dict['ID_Producto'],
+                    'nuevo_stock': producto_dict['Stock_Actual']
+                } for producto_dict in productos_dict],
+                'message': 'Lote de movimientos registrado exitosamente'
+            }), 201
+            
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return jsonify({'error': 'Error al registrar lote de movimientos'}), 500
+    
     # ===== REPORTES Y ALERTAS =====
     
     @staticmethod
@@ -419,21 +743,7 @@ class InventarioController:
                     'alerta': 'Stock crítico' if producto.Stock_Actual == 0 else 'Stock bajo'
                 })
             
-            # 🔔 NOTIFICAR STOCK BAJO PERIÓDICAMENTE
-            for producto in productos_bajo_stock:
-                if producto.Stock_Actual == 0:
-                    # Producto agotado - notificar inmediatamente
-                    ejecutar_notificacion_segura(
-                        NotificacionesInventario.notificar_stock_agotado,
-                        producto.to_dict()
-                    )
-                elif producto.Stock_Actual < producto.Stock_Minimo:
-                    # Stock bajo - notificar
-                    ejecutar_notificacion_segura(
-                        NotificacionesInventario.notificar_stock_bajo,
-                        producto.to_dict()
-                    )
-            
+            # Solo lectura: los avisos salen al cambiar el estado (evaluar_alerta_stock)
             return jsonify(alertas), 200
             
         except SQLAlchemyError as e:
@@ -448,15 +758,19 @@ class InventarioController:
             tipo = request.args.get('tipo')
             limit = request.args.get('limit', 50, type=int)
             
-            query = Movimiento.query
+            # Nombres de producto/proveedor/cliente en la misma consulta (sin N+1)
+            consulta = Movimiento.con_nombres(select(Movimiento))
             
             if producto_id:
-                query = query.filter_by(ID_Producto=producto_id)
+                consulta = consulta.where(Movimiento.ID_Producto == producto_id)
             if tipo:
-                query = query.filter_by(Tipo=tipo)
+                consulta = consulta.where(Movimiento.Tipo == tipo)
             
-            movimientos = query.order_by(Movimiento.Fecha.desc()).limit(limit).all()
-            return jsonify([movimiento.to_dict() for movimiento in movimientos]), 200
+            filas = db.session.execute(consulta.order_by(Movimiento.Fecha.desc()).limit(limit)).all()
+            return jsonify([
+                movimiento.to_dict_con_nombres(producto_nombre, proveedor_nombre, cliente_nombre)
+                for movimiento, producto_nombre, proveedor_nombre, cliente_nombre in filas
+            ]), 200
         except SQLAlchemyError as e:
             return jsonify({'error': 'Error al obtener movimientos'}), 500
     
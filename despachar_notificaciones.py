@@ -0,0 +1,36 @@
+# despachar_notificaciones.py - ENVIAR LAS NOTIFICACIONES PENDIENTES DE notificaciones_outbox
+# Uso: python despachar_notificaciones.py [--una-vez]
+# En producción correr como proceso aparte y poner OUTBOX_DESPACHADOR_INTERNO=false en la web.
+import argparse
+import os
+import signal
+import threading
+
+os.environ['OUTBOX_DESPACHADOR_INTERNO'] = 'false'
+
+from app_simple import app
+from utils.hash_password import usar_hash_en_hilo
+from utils.outbox import despachar_lote, ejecutar_despachador
+
+usar_hash_en_hilo()
+
+parser = argparse.ArgumentParser(description='Despachador de notificaciones del inventario')
+parser.add_argument('--una-vez', action='store_true', help='Procesar lo pendiente y salir')
+args = parser.parse_args()
+
+if args.una_vez:
+    total = 0
+    with app.app_context():
+        while True:
+            procesadas = despachar_lote()
+            total += procesadas
+            if not procesadas:
+                break
+    print(f"✅ {total} notificaciones procesadas")
+else:
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    signal.signal(signal.SIGINT, lambda *_: detener.set())
+    print("📨 Despachador de notificaciones iniciado")
+    ejecutar_despachador(app, detener)
+    print("👋 Despachador detenido")
@@ -0,0 +1,16 @@
+# gunicorn.conf.py - CONFIGURACIÓN DEL SERVIDOR (gunicorn la carga sola desde el directorio de trabajo)
+# Uso: gunicorn app_simple:app
+import os
+
+# Workers con hilos: /api/inventario/stream ocupa un hilo hasta EVENTOS_SSE_DURACION_MAX
+# segundos y con el worker 'sync' el arbiter lo mataría al vencer `timeout`
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+# Cada worker abre como mucho EVENTOS_SSE_MAX_CONEXIONES streams (4 por defecto),
+# así siempre quedan hilos para el resto de las peticiones
+
+# El pool de conexiones de cada worker toma por defecto GUNICORN_THREADS + 2 (DB_POOL_MAX en
+# utils/database.py): el total, workers × (hilos + 2), debe caber en max_connections de PostgreSQL
@@ -0,0 +1,37 @@
+# importar_productos.py - IMPORTAR CATÁLOGO DESDE CSV O NDJSON
+# Uso: python importar_productos.py productos.csv [--formato csv|ndjson] [--lote 500]
+import argparse
+import sys
+import time
+
+from app_simple import app
+from utils.hash_password import usar_hash_en_hilo
+from utils.importacion import IMPORTACION_LOTE, detectar_formato, leer_filas, importar_productos
+
+usar_hash_en_hilo()
+
+parser = argparse.ArgumentParser(description='Importar productos (upsert por Codigo)')
+parser.add_argument('archivo', help='Ruta del archivo CSV o NDJSON')
+parser.add_argument('--formato', choices=['csv', 'ndjson'], help='Se deduce de la extensión si se omite')
+parser.add_argument('--lote', type=int, default=IMPORTACION_LOTE, help='Filas por INSERT')
+args = parser.parse_args()
+
+formato = args.formato or detectar_formato(args.archivo)
+
+with app.app_context():
+    print(f"📦 Importando {args.archivo} ({formato}, lotes de {args.lote})...")
+    inicio = time.time()
+    
+    with open(args.archivo, 'rb') as flujo:
+        resumen = importar_productos(leer_filas(flujo, formato), args.lote)
+    
+    print(f"✅ {resumen['importadas']} productos importados de {resumen['procesadas']} filas "
+          f"en {time.time() - inicio:.1f}s")
+    
+    if resumen['total_errores']:
+        print(f"⚠️  {resumen['total_errores']} filas con error:")
+        for error in resumen['errores'][:50]:
+            print(f"  fila {error['fila']}: {error['error']}")
+        if resumen['total_errores'] > 50:
+            print(f"  ... y {resumen['total_errores'] - 50} más")
+        sys.exit(1)
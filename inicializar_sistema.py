@@ -1,5 +1,8 @@
 # inicializar_sistema.py - VERSIÓN SIMPLIFICADA
 from app_simple import app
+from utils.hash_password import usar_hash_en_hilo
+
+usar_hash_en_hilo()
 
 with app.app_context():
     from models import db, Usuario, Producto
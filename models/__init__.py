@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 from .user import Usuario
-from .inventory_models import Producto, Movimiento, Proveedor, Cliente
+from .inventory_models import Producto, Movimiento, Proveedor, Cliente, VersionCatalogo, NotificacionOutbox, EstadoAlertaStock
 
-__all__ = ['db', 'Usuario', 'Producto', 'Movimiento', 'Proveedor', 'Cliente']
\ No newline at end of file
+__all__ = ['db', 'Usuario', 'Producto', 'Movimiento', 'Proveedor', 'Cliente', 'VersionCatalogo', 'NotificacionOutbox',
+           'EstadoAlertaStock']
\ No newline at end of file
@@ -1,5 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import uuid
+from sqlalchemy import event, select, text, update
+from sqlalchemy.dialects import sqlite
 from models import db
 
 class Producto(db.Model):
@@ -32,6 +35,21 @@ class Producto(db.Model):
             'Fecha_Creacion': self.Fecha_Creacion.isoformat() if self.Fecha_Creacion else None
         }
 
+    @classmethod
+    def ajustar_stock(cls, producto_id, cantidad):
+        """
+        Sumar (o restar, con cantidad negativa) stock en un solo UPDATE condicional.
+        Devuelve el nuevo stock, o None si el producto no existe o el stock no alcanza.
+        """
+        consulta = update(cls).where(cls.ID_Producto == producto_id)
+        if cantidad < 0:
+            consulta = consulta.where(cls.Stock_Actual >= -cantidad)
+        consulta = (consulta
+                    .values(Stock_Actual=cls.Stock_Actual + cantidad)
+                    .returning(cls.Stock_Actual)
+                    .execution_options(synchronize_session=False))
+        return db.session.execute(consulta).scalar()
+
 class Proveedor(db.Model):
     __tablename__ = 'proveedores'
 
@@ -91,6 +109,14 @@ class Movimiento(db.Model):
     ID_Cliente = db.Column(db.Integer, db.ForeignKey('clientes.ID_Cliente'))
 
     def to_dict(self):
+        return self.to_dict_con_nombres(
+            self.producto.Nombre if self.producto else None,
+            self.proveedor.Nombre if self.proveedor else None,
+            self.cliente.Nombre if self.cliente else None
+        )
+
+    def to_dict_con_nombres(self, producto_nombre, proveedor_nombre, cliente_nombre):
+        """Serializar con nombres ya obtenidos por la consulta (sin cargar relaciones)"""
         return {
             'ID_Movimiento': self.ID_Movimiento,
             'Fecha': self.Fecha.isoformat() if self.Fecha else None,
@@ -101,7 +127,131 @@ class Movimiento(db.Model):
             'Responsable': self.Responsable,
             'ID_Proveedor': self.ID_Proveedor,
             'ID_Cliente': self.ID_Cliente,
-            'producto_nombre': self.producto.Nombre if self.producto else None,
-            'proveedor_nombre': self.proveedor.Nombre if self.proveedor else None,
-            'cliente_nombre': self.cliente.Nombre if self.cliente else None
-        }
\ No newline at end of file
+            'producto_nombre': producto_nombre,
+            'proveedor_nombre': proveedor_nombre,
+            'cliente_nombre': cliente_nombre
+        }
+
+    @classmethod
+    def con_nombres(cls, query):
+        """Agregar a un select() de movimientos los nombres de producto, proveedor y cliente (LEFT JOIN)"""
+        return (
+            query
+            .outerjoin(Producto, cls.ID_Producto == Producto.ID_Producto)
+            .outerjoin(Proveedor, cls.ID_Proveedor == Proveedor.ID_Proveedor)
+            .outerjoin(Cliente, cls.ID_Cliente == Cliente.ID_Cliente)
+            .add_columns(Producto.Nombre, Proveedor.Nombre, Cliente.Nombre)
+        )
+
+# En PostgreSQL la versión del catálogo es esta secuencia: nextval no bloquea ni participa en transacciones
+catalogo_version_seq = db.Sequence('catalogo_version_seq', metadata=db.metadata)
+
+class VersionCatalogo(db.Model):
+    """
+    Contador monotónico de cambios del catálogo, usado como ETag. En PostgreSQL
+    es catalogo_version_seq; en SQLite, la única fila de esta tabla.
+    """
+    __tablename__ = 'catalogo_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @staticmethod
+    def _usa_secuencia(bind):
+        return bind.dialect.name == 'postgresql'
+
+    @classmethod
+    def actual(cls):
+        """Versión vigente del catálogo (0 si aún no hubo cambios)"""
+        if cls._usa_secuencia(db.session.get_bind()):
+            fila = db.session.execute(text('SELECT last_value, is_called FROM catalogo_version_seq')).one()
+            return fila.last_value if fila.is_called else 0
+        return db.session.execute(select(cls.version).where(cls.id == 1)).scalar() or 0
+
+    @classmethod
+    def incrementar(cls):
+        """
+        Marcar que la transacción en curso cambia el catálogo. La versión sube
+        después del commit (ver _subir_version_tras_commit), así las escrituras
+        del inventario no se serializan sobre una misma fila.
+        """
+        db.session.info['catalogo_cambiado'] = True
+
+    @classmethod
+    def subir(cls):
+        """Sumar uno a la versión en una conexión propia, fuera de la transacción de escritura"""
+        with db.engine.connect() as conn:
+            if cls._usa_secuencia(conn):
+                conn.execute(catalogo_version_seq.next_value())
+            else:
+                # Un solo INSERT ... ON CONFLICT: dos primeras escrituras a la vez no chocan
+                conn.execute(
+                    sqlite.insert(cls).values(id=1, version=1)
+                    .on_conflict_do_update(index_elements=[cls.id], set_={'version': cls.version + 1})
+                )
+            conn.commit()
+
+@event.listens_for(db.session, 'after_commit')
+def _subir_version_tras_commit(session):
+    if session.info.pop('catalogo_cambiado', False):
+        try:
+            VersionCatalogo.subir()
+        except Exception as e:
+            # Sin subir la versión los clientes pueden ver un 304 viejo hasta el próximo cambio
+            print(f"❌ Error subiendo la versión del catálogo: {e}")
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambio_catalogo(session):
+    session.info.pop('catalogo_cambiado', None)
+
+class NotificacionOutbox(db.Model):
+    """
+    Notificaciones pendientes de envío (patrón outbox): se escriben en la misma
+    transacción que el cambio que las origina y las envía el despachador.
+    """
+    __tablename__ = 'notificaciones_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    Clave = db.Column(db.String(100), unique=True, nullable=False)  # idempotencia
+    Tipo = db.Column(db.String(50), nullable=False)  # método de NotificacionesInventario
+    Argumentos = db.Column(db.JSON, nullable=False)
+    Estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)  # pendiente | enviada | fallida
+    Intentos = db.Column(db.Integer, nullable=False, default=0)
+    Proximo_Intento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    Ultimo_Error = db.Column(db.Text)
+    Fecha_Creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    Fecha_Envio = db.Column(db.DateTime)
+
+    @classmethod
+    def registrar(cls, tipo, *argumentos, clave=None):
+        """Agregar una notificación a la transacción en curso (se confirma con el cambio)"""
+        notificacion = cls(
+            Clave=clave or f'{tipo}:{uuid.uuid4().hex}',
+            Tipo=tipo,
+            Argumentos=list(argumentos),
+            Estado='pendiente',
+            Intentos=0,
+            Proximo_Intento=datetime.utcnow()
+        )
+        db.session.add(notificacion)
+        return notificacion
+
+class EstadoAlertaStock(db.Model):
+    """Último estado de stock conocido y notificado por producto (normal | bajo | agotado)"""
+    __tablename__ = 'alertas_stock_estado'
+
+    ID_Producto = db.Column(db.Integer, primary_key=True)
+    Estado = db.Column(db.String(20), nullable=False, default='normal')
+    Estado_Notificado = db.Column(db.String(20))
+    Fecha_Notificacion = db.Column(db.DateTime)
+
+    @staticmethod
+    def calcular(producto_dict):
+        """Estado de alerta de un producto serializado con Producto.to_dict()"""
+        if not producto_dict['Activo']:
+            return 'normal'
+        if producto_dict['Stock_Actual'] <= 0:
+            return 'agotado'
+        if producto_dict['Stock_Actual'] < (producto_dict['Stock_Minimo'] or 0):
+            return 'bajo'
+        return 'normal'
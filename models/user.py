@@ -1,6 +1,13 @@
-from utils.database import get_connection
-from utils.validation import encriptar_password, verificar_password
+from utils.database import get_connection, tras_confirmar
+from utils.validation import encriptar_password, verificar_password, password_necesita_rehash
+from utils.hash_password import pool_hash_password
+from auth.utils import invalidar_cache_destinatarios
 from datetime import datetime, timedelta
+from models import db
+
+# Generación de las listas de destinatarios, común a todos los workers (solo PostgreSQL;
+# db.create_all() la crea). La sube auth.utils.invalidar_cache_destinatarios
+destinatarios_generacion_seq = db.Sequence('destinatarios_generacion_seq', metadata=db.metadata)
 
 class Usuario:
     def __init__(self, id, nombre, email, password, rol):
@@ -75,6 +82,7 @@ class Usuario:
             )
             nuevo_id = cursor.fetchone()[0]
             conn.commit()
+            tras_confirmar(invalidar_cache_destinatarios)
             return nuevo_id
         except Exception as e:
             conn.rollback()
@@ -111,6 +119,7 @@ class Usuario:
                 )
             
             conn.commit()
+            tras_confirmar(invalidar_cache_destinatarios)
             return True
         except Exception as e:
             conn.rollback()
@@ -152,6 +161,7 @@ class Usuario:
         try:
             cursor.execute("DELETE FROM usuarios WHERE id = %s", (id,))
             conn.commit()
+            tras_confirmar(invalidar_cache_destinatarios)
             return True
         except Exception as e:
             conn.rollback()
@@ -215,12 +225,31 @@ class Usuario:
             if row:
                 usuario = cls(*row)
                 if verificar_password(password, usuario.password):
+                    if password_necesita_rehash(usuario.password):
+                        cls._rehashear_password(conn, usuario, password)
                     return usuario
             return None
         finally:
             cursor.close()
             conn.close()
     
+    @classmethod
+    def _rehashear_password(cls, conn, usuario, password):
+        """Regenerar el hash con el costo actual (BCRYPT_ROUNDS) tras un login correcto"""
+        cursor = conn.cursor()
+        try:
+            nuevo_hash = encriptar_password(password)
+            cursor.execute("UPDATE usuarios SET password = %s WHERE id = %s", (nuevo_hash, usuario.id))
+            conn.commit()
+            usuario.password = nuevo_hash
+            pool_hash_password.registrar_rehash()
+        except Exception as e:
+            # El login sigue siendo válido aunque no se pudiera actualizar el hash
+            conn.rollback()
+            print(f"⚠️ No se pudo actualizar el hash de {usuario.email}: {e}")
+        finally:
+            cursor.close()
+    
     @classmethod
     def guardar_codigo_verificacion(cls, email, codigo):
         """Guardar código de verificación en la base de datos"""
@@ -239,7 +268,14 @@ class Usuario:
                 )
             ''')
             
-            cursor.execute("DELETE FROM codigos_verificacion WHERE expiracion < NOW()")
+            # SKIP LOCKED: no esperar a otras solicitudes que estén limpiando los mismos códigos
+            cursor.execute("""
+                DELETE FROM codigos_verificacion WHERE id IN (
+                    SELECT id FROM codigos_verificacion
+                    WHERE expiracion < NOW()
+                    FOR UPDATE SKIP LOCKED
+                )
+            """)
             
             expiracion = datetime.now() + timedelta(minutes=5)
             cursor.execute(
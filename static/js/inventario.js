@@ -4,6 +4,11 @@ let categorias = [];
 let proveedores = [];
 let clientes = [];
 
+// Paginación de productos (cursor del servidor)
+const TAMANO_PAGINA_PRODUCTOS = 100;
+let cursorSiguienteProductos = null;
+let totalProductosFiltrados = 0;
+
 // Función para obtener el rol del usuario desde data attribute
 function obtenerRolUsuario() {
     return document.body.getAttribute('data-user-rol') || 'lector';
@@ -93,13 +98,8 @@ function cargarProductos() {
     
     mostrarCargandoTabla();
 
-    // Construir URL con el filtro de estado CORREGIDO
-    const params = new URLSearchParams();
-    if (buscar) params.append('buscar', buscar);
-    if (categoria) params.append('categoria', categoria);
-    if (estado) params.append('estado', estado); // Ahora sí envía el filtro
-    if (stock) params.append('stock', stock);
-    
+    // Los filtros se aplican en el servidor; estado vacío = TODOS
+    const params = construirParametrosProductos({ buscar, categoria, estado, stock });
     const url = `/api/inventario/productos?${params.toString()}`;
     
     console.log('📡 URL backend:', url);
@@ -107,14 +107,16 @@ function cargarProductos() {
     fetch(url)
         .then(response => {
             if (!response.ok) throw new Error('Error al cargar productos');
+            leerPaginacionProductos(response);
             return response.json();
         })
         .then(data => {
-            console.log('✅ Productos del backend:', data.length);
+            console.log('✅ Productos del backend:', data.length, 'de', totalProductosFiltrados);
             
             productos = data;
             renderizarTablaProductos(data);
             actualizarEstadisticas(data);
+            actualizarBotonCargarMas();
             cargarCategorias();
         })
         .catch(error => {
@@ -123,6 +125,60 @@ function cargarProductos() {
         });
 }
 
+function construirParametrosProductos({ buscar, categoria, estado, stock }, after = null) {
+    const params = new URLSearchParams();
+    if (buscar) params.append('buscar', buscar);
+    if (categoria) params.append('categoria', categoria);
+    params.append('estado', estado || 'todos');
+    if (stock) params.append('stock', stock);
+    params.append('limit', TAMANO_PAGINA_PRODUCTOS);
+    if (after) params.append('after', after);
+    return params;
+}
+
+function leerPaginacionProductos(response) {
+    const total = response.headers.get('X-Total-Count');
+    if (total !== null) totalProductosFiltrados = parseInt(total, 10);
+    cursorSiguienteProductos = response.headers.get('X-Next-Cursor');
+}
+
+function actualizarBotonCargarMas() {
+    const contenedor = document.getElementById('paginacionProductos');
+    if (!contenedor) return;
+    contenedor.style.display = cursorSiguienteProductos ? 'block' : 'none';
+    const info = document.getElementById('infoPaginacionProductos');
+    if (info) info.textContent = `Mostrando ${productos.length} de ${totalProductosFiltrados}`;
+}
+
+// Traer la siguiente página con el mismo filtro y agregarla a la tabla
+function cargarMasProductos() {
+    if (!cursorSiguienteProductos) return;
+    
+    const params = construirParametrosProductos({
+        buscar: document.getElementById('buscarProducto').value,
+        categoria: document.getElementById('filtroCategoria').value,
+        estado: document.getElementById('filtroEstado').value,
+        stock: document.getElementById('filtroStock').value
+    }, cursorSiguienteProductos);
+    
+    fetch(`/api/inventario/productos?${params.toString()}`)
+        .then(response => {
+            if (!response.ok) throw new Error('Error al cargar productos');
+            leerPaginacionProductos(response);
+            return response.json();
+        })
+        .then(data => {
+            productos = productos.concat(data);
+            renderizarTablaProductos(productos);
+            actualizarEstadisticas(productos);
+            actualizarBotonCargarMas();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            mostrarError('Error al cargar más productos: ' + error.message);
+        });
+}
+
 function renderizarTablaProductos(productos) {
     const tbody = document.getElementById('cuerpoTabla');
     const sinResultados = document.getElementById('sinResultados');
@@ -298,15 +354,28 @@ function eliminarProductoPermanente(producto_id) {
 
 // ✅ FUNCIÓN ACTUALIZAR ESTADÍSTICAS - AGREGADA (FALTABA EN EL ORIGINAL)
 function actualizarEstadisticas(productosData = productos) {
-    const total = productosData.length;
-    const activos = productosData.filter(p => p.Activo).length;
-    const bajoStock = productosData.filter(p => p.Activo && p.Stock_Actual > 0 && p.Stock_Actual < p.Stock_Minimo).length;
-    const sinStock = productosData.filter(p => p.Activo && p.Stock_Actual === 0).length;
-    
+    // Con paginación el total real viene del servidor (X-Total-Count)
+    const total = Math.max(totalProductosFiltrados, productosData.length);
     document.getElementById('totalProductos').textContent = total;
-    document.getElementById('productosActivos').textContent = activos;
-    document.getElementById('stockBajo').textContent = bajoStock;
-    document.getElementById('sinStock').textContent = sinStock;
+    cargarResumenEstadisticas();
+}
+
+// Activos, stock bajo y sin stock se cuentan en el servidor sobre todo el catálogo,
+// no solo sobre la página cargada (con ETag: si nada cambió responde 304)
+function cargarResumenEstadisticas() {
+    fetch('/api/inventario/reportes/resumen')
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(({ resumen }) => {
+            document.getElementById('productosActivos').textContent = resumen.total_productos_activos;
+            document.getElementById('stockBajo').textContent = resumen.productos_bajo_minimo;
+            document.getElementById('sinStock').textContent = resumen.productos_sin_stock;
+        })
+        .catch(error => {
+            console.error('Error cargando estadísticas:', error);
+        });
 }
 
 // ✅ FUNCIÓN CARGAR ESTADÍSTICAS - PARA USO INICIAL (FALTABA EN EL ORIGINAL)
@@ -316,8 +385,11 @@ function cargarEstadisticas() {
         actualizarEstadisticas();
     } else {
         // Si no, hacer una petición específica para estadísticas
-        fetch('/api/inventario/productos')
-            .then(response => response.json())
+        fetch(`/api/inventario/productos?estado=todos&limit=${TAMANO_PAGINA_PRODUCTOS}`)
+            .then(response => {
+                leerPaginacionProductos(response);
+                return response.json();
+            })
             .then(data => {
                 actualizarEstadisticas(data);
             })
@@ -765,11 +837,23 @@ function cargarAlertasStock() {
 }
 
 function cargarCategorias() {
-    // Extraer categorías únicas de los productos
-    const categoriasUnicas = [...new Set(productos.map(p => p.Categoria).filter(Boolean))];
-    
+    // Las categorías vienen del servidor: la página cargada no las contiene todas
+    fetch('/api/inventario/categorias')
+        .then(response => {
+            if (!response.ok) throw new Error('Error al cargar categorías');
+            return response.json();
+        })
+        .then(data => {
+            categorias = data;
+            renderizarCategorias(data);
+        })
+        .catch(error => console.error('Error cargando categorías:', error));
+}
+
+function renderizarCategorias(categoriasUnicas) {
     const select = document.getElementById('filtroCategoria');
     const datalist = document.getElementById('categoriasList');
+    const seleccionada = select.value;
     
     // Limpiar
     select.innerHTML = '<option value="">Todas las categorías</option>';
@@ -787,6 +871,11 @@ function cargarCategorias() {
         datalistOption.value = categoria;
         datalist.appendChild(datalistOption);
     });
+    
+    // Conservar la categoría elegida al recargar la lista
+    if (seleccionada && categoriasUnicas.includes(seleccionada)) {
+        select.value = seleccionada;
+    }
 }
 
 function cargarProveedoresClientes() {
@@ -903,9 +992,75 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
-// Auto-actualización cada 30 segundos
+// =============================================
+// ACTUALIZACIONES EN VIVO (Server-Sent Events)
+// =============================================
+
+let fuenteEventos = null;
+
+function conectarEventosInventario() {
+    if (!window.EventSource) return;
+    
+    fuenteEventos = new EventSource('/api/inventario/stream');
+    
+    // Los eventos publicados mientras el stream estaba caído se pierden: al reconectar
+    // (cada EVENTOS_SSE_DURACION_MAX o tras un corte) se recarga la lista completa
+    let primeraConexion = true;
+    fuenteEventos.onopen = () => {
+        if (primeraConexion) {
+            primeraConexion = false;
+            return;
+        }
+        resincronizarInventario();
+    };
+    
+    fuenteEventos.addEventListener('resync', () => resincronizarInventario());
+    fuenteEventos.addEventListener('producto', e => aplicarDeltaProducto(JSON.parse(e.data)));
+    fuenteEventos.addEventListener('producto_eliminado', e => {
+        const { ID_Producto } = JSON.parse(e.data);
+        productos = productos.filter(p => p.ID_Producto !== ID_Producto);
+        refrescarVistaProductos();
+    });
+    fuenteEventos.addEventListener('alerta', () => cargarAlertasStock());
+    fuenteEventos.onerror = () => console.warn('⚠️ Stream de inventario desconectado, reintentando...');
+}
+
+function resincronizarInventario() {
+    cargarProductos();
+    cargarAlertasStock();
+}
+
+function streamConectado() {
+    return fuenteEventos !== null && fuenteEventos.readyState === EventSource.OPEN;
+}
+
+// Aplicar el nuevo estado de un producto sin recargar la lista completa
+function aplicarDeltaProducto(producto) {
+    const indice = productos.findIndex(p => p.ID_Producto === producto.ID_Producto);
+    const visible = filtrarProductosEnFrontend([producto]).length > 0;
+    
+    if (indice >= 0 && visible) {
+        productos[indice] = producto;
+    } else if (indice >= 0) {
+        productos.splice(indice, 1);
+    } else if (visible && !cursorSiguienteProductos) {
+        // Solo agregar si ya está cargada la última página (si no, llegará al paginar)
+        productos.push(producto);
+    } else {
+        return;
+    }
+    refrescarVistaProductos();
+}
+
+function refrescarVistaProductos() {
+    renderizarTablaProductos(productos);
+    actualizarEstadisticas(productos);
+    cargarAlertasStock();
+}
+
+// Auto-actualización cada 30 segundos (solo si el stream no está disponible)
 setInterval(() => {
-    if (!document.hidden) {
+    if (!document.hidden && !streamConectado()) {
         cargarProductos();
         cargarAlertasStock();
     }
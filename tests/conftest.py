@@ -0,0 +1,49 @@
+# tests/conftest.py - CONFIGURACIÓN COMÚN DE LAS PRUEBAS (python -m pytest -q)
+import os
+import sys
+import tempfile
+
+# Antes de importar la aplicación: SQLite temporal, sin despachador de fondo y bcrypt en el mismo hilo
+_directorio = tempfile.mkdtemp(prefix='inventario-tests-')
+os.environ['RENDER'] = 'false'
+os.environ['SQLITE_URI'] = f"sqlite:///{os.path.join(_directorio, 'pruebas.db')}"
+os.environ['OUTBOX_DESPACHADOR_INTERNO'] = 'false'
+os.environ['BCRYPT_PROCESOS'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def app():
+    """Aplicación con un catálogo de 25 productos (Stock_Actual = i % 8, Stock_Minimo = 5)"""
+    from app_simple import app
+    from models import db, Producto, Proveedor, Cliente
+    
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in range(25):
+            db.session.add(Producto(Codigo=f'P{i:03}', Nombre=f'Producto {i}', Categoria='A' if i % 2 else 'B',
+                                    Unidad='pz', Stock_Minimo=5, Stock_Actual=i % 8))
+        db.session.add(Proveedor(Nombre='Proveedor'))
+        db.session.add(Cliente(Nombre='Cliente'))
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def crear_cliente(app):
+    """Cliente de pruebas con una sesión ya verificada (2FA) para el rol indicado"""
+    def crear(rol='admin'):
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['user_id'] = 1
+            sesion['user_nombre'] = 'Pruebas'
+            sesion['user_email'] = 'pruebas@example.com'
+            sesion['user_rol'] = rol
+            sesion['twofa_verified'] = True
+        return cliente
+    return crear
@@ -0,0 +1,37 @@
+# tests/test_destinatarios.py - CACHÉ DE DESTINATARIOS E INVALIDACIÓN ENTRE WORKERS
+import pytest
+
+import auth.utils as utils_auth
+
+
+@pytest.fixture
+def consultas(app, monkeypatch):
+    """Simula la generación compartida de PostgreSQL y cuenta las consultas a usuarios"""
+    estado = {'generacion': 1, 'consultas': 0}
+    
+    def consultar_correos(roles):
+        estado['consultas'] += 1
+        return [f'{rol}@example.com' for rol in roles]
+    
+    monkeypatch.setattr(utils_auth, '_generacion_compartida', lambda: estado['generacion'])
+    monkeypatch.setattr(utils_auth, '_consultar_correos', consultar_correos)
+    utils_auth._destinatarios_cache.clear()
+    with app.app_context():
+        yield estado
+    utils_auth._destinatarios_cache.clear()
+
+
+def test_reutiliza_la_lista_mientras_no_cambia_la_generacion(consultas):
+    assert utils_auth.obtener_correos_de_roles('editor', 'admin') == ['admin@example.com', 'editor@example.com']
+    utils_auth.obtener_correos_de_roles('admin', 'editor')
+    
+    assert consultas['consultas'] == 1
+
+
+def test_cambio_en_otro_worker_invalida_la_cache(consultas):
+    utils_auth.obtener_correos_de_roles('admin')
+    # Otro worker cambió un usuario: solo la generación compartida se enteró
+    consultas['generacion'] += 1
+    utils_auth.obtener_correos_de_roles('admin')
+    
+    assert consultas['consultas'] == 2
@@ -0,0 +1,57 @@
+# tests/test_importacion.py - IMPORTACIÓN MASIVA: ALERTAS Y AVISO A LOS TABLEROS
+import io
+
+from models import db, Producto, EstadoAlertaStock, NotificacionOutbox
+from utils.eventos import bus_eventos
+from utils.importacion import importar_productos, leer_filas
+
+
+def _importar(texto):
+    return importar_productos(leer_filas(io.BytesIO(texto.encode('utf-8')), 'csv'))
+
+
+def _eventos(cola):
+    eventos = []
+    while not cola.empty():
+        eventos.append(cola.get_nowait())
+    return eventos
+
+
+def test_importar_evalua_alertas_y_publica_resync(app):
+    cola = bus_eventos.suscribir()
+    try:
+        with app.app_context():
+            # P007 tiene 7 en stock: con Stock_Minimo 10 pasa a bajo; NUEVO entra agotado
+            resumen = _importar(
+                'Codigo,Nombre,Unidad,Stock_Minimo,Stock_Actual\n'
+                'P007,Producto 7,pz,10,\n'
+                'NUEVO,Producto nuevo,pz,3,0\n'
+            )
+            
+            assert resumen['importadas'] == 2
+            assert Producto.query.filter_by(Codigo='P007').one().Stock_Actual == 7
+            
+            estados = {
+                producto.Codigo: db.session.get(EstadoAlertaStock, producto.ID_Producto).Estado
+                for producto in Producto.query.filter(Producto.Codigo.in_(['P007', 'NUEVO']))
+            }
+            assert estados == {'P007': 'bajo', 'NUEVO': 'agotado'}
+            assert sorted(n.Tipo for n in NotificacionOutbox.query.all()) == [
+                'notificar_stock_agotado', 'notificar_stock_bajo'
+            ]
+        
+        assert [evento['tipo'] for evento in _eventos(cola)] == ['resync']
+    finally:
+        bus_eventos.desuscribir(cola)
+
+
+def test_sin_filas_validas_no_publica_resync(app):
+    cola = bus_eventos.suscribir()
+    try:
+        with app.app_context():
+            resumen = _importar('Codigo,Nombre,Unidad\n,Sin código,pz\n')
+        
+        assert resumen['importadas'] == 0
+        assert _eventos(cola) == []
+    finally:
+        bus_eventos.desuscribir(cola)
@@ -0,0 +1,38 @@
+# tests/test_login_saturado.py - LOGIN CON EL POOL DE CONTRASEÑAS SATURADO
+import pytest
+
+import auth.routes
+import auth.utils
+from models.user import Usuario
+from utils.hash_password import HashSaturadoError, BCRYPT_REINTENTAR
+
+
+@pytest.fixture
+def pool_saturado(app, monkeypatch):
+    def verificar_login(email, password):
+        raise HashSaturadoError('Servicio de contraseñas saturado, intenta de nuevo')
+    
+    monkeypatch.setattr(Usuario, 'verificar_login', staticmethod(verificar_login))
+    monkeypatch.setattr(auth.routes, 'usuario_tiene_sesion_activa', lambda email: False)
+    monkeypatch.setattr(auth.utils, 'usuario_tiene_sesion_activa', lambda email: False)
+    return app
+
+
+def test_login_formulario_responde_503(pool_saturado):
+    respuesta = pool_saturado.test_client().post('/login', data={
+        'email': 'saturado-form@example.com', 'password': 'secreto123'
+    })
+    
+    assert respuesta.status_code == 503
+    assert 'El servicio está ocupado' in respuesta.get_data(as_text=True)
+    assert 'saturado, intenta' not in respuesta.get_data(as_text=True)
+
+
+def test_login_api_responde_503_con_retry_after(pool_saturado):
+    respuesta = pool_saturado.test_client().post('/api/auth/login', json={
+        'email': 'saturado-api@example.com', 'password': 'secreto123'
+    })
+    
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == str(BCRYPT_REINTENTAR)
+    assert respuesta.get_json()['code'] == 'SERVICIO_OCUPADO'
@@ -0,0 +1,49 @@
+# tests/test_notificaciones.py - CORREOS DEL INVENTARIO
+import pytest
+
+import utils.notifications as notificaciones
+from utils.notifications import NotificacionesInventario
+
+PRODUCTO = {'ID_Producto': 1, 'Codigo': 'P001', 'Nombre': 'Tornillo <M6>', 'Categoria': 'A', 'Unidad': 'pz',
+            'Stock_Actual': 0, 'Stock_Minimo': 5, 'Activo': True}
+MOVIMIENTO = {'Cantidad': 3, 'Referencia_Documento': 'FAC-001'}
+
+
+@pytest.fixture
+def envios(monkeypatch):
+    enviados = []
+    
+    def enviar(destinatarios, asunto, cuerpo, tipo):
+        enviados.append({'destinatarios': destinatarios, 'asunto': asunto, 'cuerpo': cuerpo, 'tipo': tipo})
+        return [(destinatario, True) for destinatario in destinatarios]
+    
+    monkeypatch.setattr(notificaciones, 'obtener_correos_de_roles', lambda *roles: ['admin@example.com'])
+    monkeypatch.setattr(notificaciones, 'enviar_notificacion_inventario_lote', enviar)
+    return enviados
+
+
+@pytest.mark.parametrize('metodo, argumentos, tipo', [
+    ('notificar_nuevo_producto', (PRODUCTO, 'Admin'), 'nuevo_producto'),
+    ('notificar_entrada_inventario', (MOVIMIENTO, PRODUCTO, 'Admin', 3), 'entrada_inventario'),
+    ('notificar_salida_inventario', (MOVIMIENTO, PRODUCTO, 'Admin', 0), 'salida_inventario'),
+    ('notificar_stock_agotado', (PRODUCTO,), 'stock_agotado'),
+    ('notificar_stock_bajo', (PRODUCTO,), 'stock_bajo'),
+    ('notificar_resumen_movimientos', ([('notificar_entrada_inventario', (MOVIMIENTO, PRODUCTO, 'Admin', 3))],),
+     'resumen_movimientos'),
+])
+def test_envia_la_plantilla_del_tipo(envios, metodo, argumentos, tipo):
+    resultados = getattr(NotificacionesInventario, metodo)(*argumentos)
+    
+    assert resultados == [('admin@example.com', True)]
+    assert envios[0]['tipo'] == tipo
+    assert 'Tornillo &lt;M6&gt;' in envios[0]['cuerpo']
+
+
+def test_error_se_relanza(monkeypatch):
+    def sin_usuarios(*roles):
+        raise RuntimeError('sin acceso a usuarios')
+    
+    monkeypatch.setattr(notificaciones, 'obtener_correos_de_roles', sin_usuarios)
+    
+    with pytest.raises(RuntimeError):
+        NotificacionesInventario.notificar_stock_bajo(PRODUCTO)
@@ -0,0 +1,35 @@
+# tests/test_outbox_metricas.py - MÉTRICAS DEL OUTBOX DE NOTIFICACIONES
+from datetime import datetime, timedelta
+
+from models import db, NotificacionOutbox
+
+
+def _agregar(estado, intentos, antiguedad_minutos=0):
+    notificacion = NotificacionOutbox.registrar('notificar_stock_bajo', {'ID_Producto': 1})
+    notificacion.Estado = estado
+    notificacion.Intentos = intentos
+    notificacion.Fecha_Creacion = datetime.utcnow() - timedelta(minutes=antiguedad_minutos)
+
+
+def test_metricas_del_outbox(app, crear_cliente):
+    with app.app_context():
+        _agregar('pendiente', 0, antiguedad_minutos=10)
+        _agregar('pendiente', 2)
+        _agregar('pendiente', 2)
+        _agregar('fallida', 8)
+        _agregar('enviada', 1)
+        db.session.commit()
+    
+    respuesta = crear_cliente('admin').get('/api/inventario/notificaciones/metricas')
+    
+    assert respuesta.status_code == 200
+    metricas = respuesta.get_json()
+    assert (metricas['pendientes'], metricas['fallidas'], metricas['enviadas']) == (3, 1, 1)
+    assert 600 <= metricas['antiguedad_pendiente_segundos'] < 660
+    assert metricas['intentos'] == {'0': 1, '2': 2, '8': 1}
+
+
+def test_metricas_solo_admin(app, crear_cliente):
+    respuesta = crear_cliente('editor').get('/api/inventario/notificaciones/metricas')
+    
+    assert respuesta.status_code == 403
@@ -0,0 +1,51 @@
+# tests/test_presupuesto_consultas.py - PRESUPUESTO DE CONSULTAS DE LOS ENDPOINTS DE LECTURA
+# Un N+1 hace crecer el número de consultas con los datos; aquí se fija un tope que no depende de ellos.
+import pytest
+
+from models import db, Producto, Movimiento, Proveedor, Cliente
+from utils.database import contar_consultas
+
+# Los de catálogo leen además la versión para el ETag; /productos cuenta el total para la paginación
+PRESUPUESTO = {
+    '/api/inventario/productos': 3,
+    '/api/inventario/movimientos': 1,
+    '/api/inventario/alertas': 2,
+}
+
+
+def _agregar_datos(app, cantidad):
+    """Más productos y movimientos (con proveedor o cliente) para detectar consultas por fila"""
+    with app.app_context():
+        proveedor = Proveedor.query.first()
+        cliente = Cliente.query.first()
+        inicio = Producto.query.count()
+        for i in range(inicio, inicio + cantidad):
+            producto = Producto(Codigo=f'P{i:03}', Nombre=f'Producto {i}', Categoria='C', Unidad='pz',
+                                Stock_Minimo=5, Stock_Actual=i % 3)
+            db.session.add(producto)
+            db.session.flush()
+            db.session.add(Movimiento(Tipo='Entrada', ID_Producto=producto.ID_Producto, Cantidad=3,
+                                      Responsable='Pruebas', ID_Proveedor=proveedor.ID_Proveedor))
+            db.session.add(Movimiento(Tipo='Salida', ID_Producto=producto.ID_Producto, Cantidad=1,
+                                      Responsable='Pruebas', ID_Cliente=cliente.ID_Cliente))
+        db.session.commit()
+
+
+def _consultas(cliente, ruta):
+    with contar_consultas() as consultas:
+        respuesta = cliente.get(ruta)
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+    return consultas['total']
+
+
+@pytest.mark.parametrize('ruta', sorted(PRESUPUESTO))
+def test_consultas_dentro_del_presupuesto(app, crear_cliente, ruta):
+    cliente = crear_cliente('lector')
+    _agregar_datos(app, 5)
+    pocos = _consultas(cliente, ruta)
+    
+    _agregar_datos(app, 40)
+    muchos = _consultas(cliente, ruta)
+    
+    assert muchos <= PRESUPUESTO[ruta]
+    assert muchos == pocos
@@ -0,0 +1,108 @@
+# tests/test_unidad_de_trabajo.py - CONFIRMACIÓN DE LA UNIDAD DE TRABAJO SEGÚN LA RESPUESTA
+import sqlite3
+
+import pytest
+from flask import Flask, jsonify
+
+import utils.database as database
+from utils.database import (
+    get_connection, liberar_unidad_de_trabajo, registrar_unidad_de_trabajo, tras_confirmar
+)
+
+
+@pytest.fixture
+def archivo_db(tmp_path, monkeypatch):
+    """La unidad de trabajo toma sus conexiones de un SQLite en lugar de PostgreSQL"""
+    ruta = str(tmp_path / 'unidad.db')
+    conn = sqlite3.connect(ruta)
+    conn.execute('CREATE TABLE registros (valor TEXT)')
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(database, '_conexion_pool', lambda: sqlite3.connect(ruta))
+    return ruta
+
+
+@pytest.fixture
+def app(archivo_db):
+    app = Flask(__name__)
+    registrar_unidad_de_trabajo(app)
+    app.confirmados = []
+    
+    def escribir(valor):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"INSERT INTO registros (valor) VALUES ('{valor}')")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        tras_confirmar(lambda: app.confirmados.append(valor))
+    
+    @app.route('/ok')
+    def ok():
+        escribir('ok')
+        return jsonify({'message': 'ok'}), 200
+    
+    @app.route('/error-500')
+    def error_500():
+        escribir('error-500')
+        return jsonify({'error': 'falló', 'code': 'ERROR'}), 500
+    
+    @app.route('/error-400')
+    def error_400():
+        escribir('error-400')
+        return jsonify({'error': 'datos inválidos', 'code': 'DATOS_INVALIDOS'}), 400
+    
+    @app.route('/excepcion')
+    def excepcion():
+        escribir('excepcion')
+        raise RuntimeError('fallo sin manejar')
+    
+    @app.route('/liberar-y-fallar')
+    def liberar_y_fallar():
+        escribir('antes-http')
+        liberar_unidad_de_trabajo()
+        escribir('despues-http')
+        return jsonify({'error': 'falló', 'code': 'ERROR'}), 500
+    
+    return app
+
+
+def _valores(archivo_db):
+    conn = sqlite3.connect(archivo_db)
+    try:
+        return [fila[0] for fila in conn.execute('SELECT valor FROM registros')]
+    finally:
+        conn.close()
+
+
+def test_respuesta_exitosa_confirma(app, archivo_db):
+    respuesta = app.test_client().get('/ok')
+    
+    assert respuesta.status_code == 200
+    assert _valores(archivo_db) == ['ok']
+    assert app.confirmados == ['ok']
+
+
+@pytest.mark.parametrize('ruta', ['/error-500', '/error-400'])
+def test_respuesta_de_error_no_deja_filas(app, archivo_db, ruta):
+    respuesta = app.test_client().get(ruta)
+    
+    assert respuesta.status_code >= 400
+    assert _valores(archivo_db) == []
+    assert app.confirmados == []
+
+
+def test_excepcion_no_manejada_no_deja_filas(app, archivo_db):
+    respuesta = app.test_client().get('/excepcion')
+    
+    assert respuesta.status_code == 500
+    assert _valores(archivo_db) == []
+    assert app.confirmados == []
+
+
+def test_liberar_confirma_lo_previo_y_abre_otra_unidad(app, archivo_db):
+    respuesta = app.test_client().get('/liberar-y-fallar')
+    
+    assert respuesta.status_code == 500
+    assert _valores(archivo_db) == ['antes-http']
+    assert app.confirmados == ['antes-http']
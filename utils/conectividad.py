@@ -0,0 +1,91 @@
+# utils/conectividad.py - MONITOR DE CONEXIÓN A INTERNET EN SEGUNDO PLANO
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+import requests
+
+CONECTIVIDAD_CONFIG = {
+    # 'host:puerto' (conexión TCP), una URL http(s) (GET) o 'online'/'offline' para fijar el estado
+    'objetivo': os.getenv('CONEXION_OBJETIVO', '8.8.8.8:53'),
+    'intervalo': float(os.getenv('CONEXION_INTERVALO', 30)),  # segundos entre comprobaciones
+    'timeout': float(os.getenv('CONEXION_TIMEOUT', 3)),
+}
+
+
+class MonitorConectividad:
+    """
+    Comprueba la conexión en un hilo propio cada `intervalo` segundos; los
+    handlers solo leen el último resultado en memoria.
+    """
+
+    def __init__(self, objetivo='8.8.8.8:53', intervalo=30, timeout=3):
+        self.objetivo = objetivo
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._primera = threading.Event()
+        self._hilo = None
+        self._pid = None
+        self._estado = {'online': False, 'verificado': None, 'latencia_ms': None}
+
+    def _sondear(self):
+        if self.objetivo in ('online', 'offline'):
+            return self.objetivo == 'online'
+        if self.objetivo.startswith(('http://', 'https://')):
+            return requests.get(self.objetivo, timeout=self.timeout).status_code < 500
+        host, _, puerto = self.objetivo.rpartition(':')
+        socket.create_connection((host, int(puerto)), timeout=self.timeout).close()
+        return True
+
+    def comprobar(self):
+        """Hacer una comprobación ahora y guardar el resultado"""
+        inicio = time.monotonic()
+        try:
+            online = self._sondear()
+        except Exception:
+            online = False
+        with self._lock:
+            self._estado = {
+                'online': online,
+                'verificado': datetime.now(),
+                'latencia_ms': round((time.monotonic() - inicio) * 1000, 1) if online else None
+            }
+        self._primera.set()
+        return online
+
+    def _ejecutar(self):
+        while True:
+            self.comprobar()
+            time.sleep(self.intervalo)
+
+    def _iniciar(self):
+        """Arrancar el hilo al primer uso (y de nuevo en el hijo tras un fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._primera.clear()
+            self._hilo = threading.Thread(target=self._ejecutar, name='monitor-conectividad', daemon=True)
+            self._hilo.start()
+
+    def estado(self):
+        """Último resultado: {'online', 'verificado', 'latencia_ms', 'objetivo'}"""
+        self._iniciar()
+        # Solo la primera lectura del proceso espera (como mucho `timeout`) a la primera comprobación
+        self._primera.wait(self.timeout + 0.5)
+        with self._lock:
+            return {**self._estado, 'objetivo': self.objetivo}
+
+    @property
+    def online(self):
+        # Camino rápido: el hilo ya corre en este proceso y hay un resultado (lectura atómica del dict)
+        if self._pid == os.getpid() and self._primera.is_set():
+            return self._estado['online']
+        return self.estado()['online']
+
+
+monitor_conectividad = MonitorConectividad(**CONECTIVIDAD_CONFIG)
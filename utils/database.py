@@ -1,6 +1,11 @@
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 import pg8000
 from dotenv import load_dotenv
+from flask import has_app_context, has_request_context, current_app, g
 
 load_dotenv()
 
@@ -12,14 +17,503 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 5432))
 }
 
+# Configuración del pool de conexiones
+POOL_CONFIG = {
+    'minimo': int(os.getenv('DB_POOL_MIN', 1)),
+    # Una conexión por hilo de gunicorn más margen para el despachador del outbox; cada
+    # worker tiene su pool, así que PostgreSQL ve hasta WEB_CONCURRENCY × DB_POOL_MAX
+    'maximo': int(os.getenv('DB_POOL_MAX', int(os.getenv('GUNICORN_THREADS', 8)) + 2)),
+    'inactividad_max': float(os.getenv('DB_POOL_INACTIVIDAD', 300)),  # segundos antes de cerrar una conexión ociosa
+    'verificar_tras': float(os.getenv('DB_POOL_VERIFICAR_TRAS', 30)),  # segundos ociosa antes de hacer ping al prestarla
+    'espera_max': float(os.getenv('DB_POOL_ESPERA', 10))  # segundos esperando una conexión libre
+}
+
+
+def opciones_engine():
+    """Opciones de pool para el engine de Flask-SQLAlchemy, derivadas de POOL_CONFIG"""
+    return {
+        'pool_size': POOL_CONFIG['maximo'],
+        'max_overflow': int(os.getenv('DB_POOL_OVERFLOW', 0)),
+        'pool_timeout': POOL_CONFIG['espera_max'],
+        'pool_recycle': int(os.getenv('DB_POOL_RECICLAR', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+
+
+class ConexionAgotadaError(Exception):
+    """No hay conexiones libres en el pool dentro del tiempo de espera"""
+    pass
+
+
+class _ConexionPooled:
+    """Envoltura de una conexión pg8000: close() la devuelve al pool en lugar de cerrarla"""
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+    
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise pg8000.InterfaceError("La conexión ya fue devuelta al pool")
+        return getattr(self._conn, nombre)
+    
+    def cursor(self):
+        if self._conn is None:
+            raise pg8000.InterfaceError("La conexión ya fue devuelta al pool")
+        return self._conn.cursor()
+    
+    def close(self):
+        """Devolver la conexión al pool (idempotente)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.devolver(conn)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def __del__(self):
+        # Conexión olvidada sin close(): liberar su lugar en el pool sin reutilizarla
+        conn, self._conn = getattr(self, '_conn', None), None
+        if conn is not None:
+            self._pool._descartar(conn)
+
+
+class PoolConexiones:
+    """Pool de conexiones pg8000 acotado y seguro entre hilos"""
+    
+    def __init__(self, minimo=1, maximo=10, inactividad_max=300, verificar_tras=30, espera_max=10):
+        self.minimo = max(0, minimo)
+        self.maximo = max(1, maximo, self.minimo)
+        self.inactividad_max = inactividad_max
+        self.verificar_tras = verificar_tras
+        self.espera_max = espera_max
+        self._cond = threading.Condition()
+        self._libres = deque()  # (conexion, instante del último uso); las más recientes a la derecha
+        self._total = 0
+        self._pid = os.getpid()
+    
+    def _crear(self):
+        try:
+            return pg8000.connect(**DB_CONFIG)
+        except Exception as e:
+            print(f"Error conectando a PostgreSQL: {e}")
+            raise
+    
+    @staticmethod
+    def _cerrar_silencioso(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _reiniciar_si_fork(self):
+        """Tras un fork (p. ej. gunicorn --preload) no se comparten sockets con el proceso padre"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._libres.clear()
+            self._total = 0
+    
+    def _extraer_inactivas(self, ahora):
+        """Sacar del pool las conexiones ociosas demasiado tiempo, respetando el mínimo"""
+        vencidas = []
+        while self._libres and self._total > self.minimo:
+            conn, ultimo_uso = self._libres[0]
+            if ahora - ultimo_uso < self.inactividad_max:
+                break
+            self._libres.popleft()
+            self._total -= 1
+            vencidas.append(conn)
+        return vencidas
+    
+    def _esta_viva(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def obtener(self):
+        """Prestar una conexión del pool (crea una nueva si hay capacidad)"""
+        limite = time.monotonic() + self.espera_max
+        
+        while True:
+            crear = False
+            with self._cond:
+                self._reiniciar_si_fork()
+                vencidas = self._extraer_inactivas(time.monotonic())
+                
+                while not self._libres and self._total >= self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise ConexionAgotadaError(
+                            f"Sin conexiones libres tras {self.espera_max}s (máximo {self.maximo})"
+                        )
+                    self._cond.wait(restante)
+                
+                if self._libres:
+                    conn, ultimo_uso = self._libres.pop()
+                else:
+                    self._total += 1
+                    crear = True
+            
+            for vencida in vencidas:
+                self._cerrar_silencioso(vencida)
+            
+            if crear:
+                try:
+                    conn = self._crear()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                return _ConexionPooled(self, conn)
+            
+            # Verificar salud solo si la conexión estuvo ociosa un rato
+            if time.monotonic() - ultimo_uso < self.verificar_tras or self._esta_viva(conn):
+                return _ConexionPooled(self, conn)
+            
+            self._descartar(conn)
+    
+    def _descartar(self, conn):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        self._cerrar_silencioso(conn)
+    
+    def devolver(self, conn):
+        """Recibir una conexión prestada; se deshace cualquier transacción pendiente"""
+        if self._pid != os.getpid():
+            return
+        
+        try:
+            if getattr(conn, '_in_transaction', True):
+                conn.rollback()
+        except Exception:
+            self._descartar(conn)
+            return
+        
+        with self._cond:
+            self._libres.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    @contextmanager
+    def conexion(self):
+        """Context manager: presta una conexión y la devuelve al salir"""
+        conn = self.obtener()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def cerrar_todas(self):
+        """Cerrar las conexiones libres (las prestadas se cerrarán al devolverse)"""
+        with self._cond:
+            libres = [conn for conn, _ in self._libres]
+            self._libres.clear()
+            self._total -= len(libres)
+        for conn in libres:
+            self._cerrar_silencioso(conn)
+    
+    def estadisticas(self):
+        """Estado actual del pool"""
+        with self._cond:
+            return {
+                'total': self._total,
+                'libres': len(self._libres),
+                'en_uso': self._total - len(self._libres),
+                'minimo': self.minimo,
+                'maximo': self.maximo
+            }
+
+
+pool = PoolConexiones(**POOL_CONFIG)
+
+
+def _engine_compartido():
+    """Engine de Flask-SQLAlchemy si hay contexto de aplicación y apunta a PostgreSQL"""
+    if not has_app_context():
+        return None
+    from models import db
+    try:
+        engine = db.engine
+    except Exception:
+        return None
+    if engine.dialect.name != 'postgresql':
+        return None
+    return engine
+
+
+def _conexion_pool():
+    """Conexión del pool del engine compartido o, si no aplica, del pool propio"""
+    engine = _engine_compartido()
+    if engine is not None:
+        return engine.raw_connection()
+    return pool.obtener()
+
+
+# ===== UNIDAD DE TRABAJO POR SOLICITUD =====
+
+class _CursorSolicitud:
+    """Cursor que, ante un error de SQL, vuelve al savepoint de su llamada"""
+    
+    def __init__(self, conexion, cursor):
+        self._conexion = conexion
+        self._cursor = cursor
+    
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+    
+    def __iter__(self):
+        return iter(self._cursor)
+    
+    def execute(self, *args, **kwargs):
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        except Exception:
+            self._conexion.rollback()
+            raise
+    
+    def executemany(self, *args, **kwargs):
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        except Exception:
+            self._conexion.rollback()
+            raise
+
+
+class _ConexionSolicitud:
+    """
+    Vista de la conexión de la solicitud para una llamada a get_connection().
+    commit() y close() no tocan la conexión real (se confirma al final de la
+    solicitud); rollback() solo deshace lo hecho desde esta llamada.
+    """
+    
+    def __init__(self, unidad):
+        self._unidad = unidad
+        self._savepoint = None
+    
+    def __getattr__(self, nombre):
+        return getattr(self._unidad.conn, nombre)
+    
+    def _asegurar_savepoint(self):
+        if self._savepoint is None:
+            self._savepoint = self._unidad.nuevo_savepoint()
+    
+    def cursor(self):
+        self._asegurar_savepoint()
+        return _CursorSolicitud(self, self._unidad.conn.cursor())
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        if self._savepoint is None:
+            return
+        cursor = self._unidad.conn.cursor()
+        try:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+        finally:
+            cursor.close()
+    
+    def close(self):
+        pass
+
+
+class UnidadDeTrabajo:
+    """Una conexión y una transacción compartidas por toda la solicitud"""
+    
+    def __init__(self):
+        self.conn = None
+        self._savepoints = 0
+        self._al_confirmar = []
+    
+    def conexion(self):
+        if self.conn is None:
+            self.conn = _conexion_pool()
+        return _ConexionSolicitud(self)
+    
+    def nuevo_savepoint(self):
+        self._savepoints += 1
+        nombre = f"uow_{self._savepoints}"
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {nombre}")
+        finally:
+            cursor.close()
+        return nombre
+    
+    def tras_confirmar(self, callback):
+        self._al_confirmar.append(callback)
+    
+    def confirmar(self):
+        if self.conn is not None:
+            self.conn.commit()
+        callbacks, self._al_confirmar = self._al_confirmar, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"❌ Error tras confirmar la unidad de trabajo: {e}")
+    
+    def descartar(self):
+        """Deshacer lo escrito en la solicitud; los callbacks de tras_confirmar no se ejecutan"""
+        self._al_confirmar = []
+        if self.conn is not None:
+            self.conn.rollback()
+    
+    def cerrar(self):
+        """Devolver la conexión al pool; lo no confirmado se deshace al devolverla"""
+        self._al_confirmar = []
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            conn.close()
+
+
+def _unidad_de_trabajo_activa():
+    return has_request_context() and current_app.extensions.get('unidad_de_trabajo', False)
+
+
+def registrar_unidad_de_trabajo(app):
+    """Hacer que get_connection() reutilice una sola conexión y transacción por solicitud"""
+    app.extensions['unidad_de_trabajo'] = True
+    
+    @app.after_request
+    def confirmar_unidad_de_trabajo(response):
+        # También corre con las excepciones no manejadas (ya convertidas en 500):
+        # solo se confirma si la respuesta no es un error
+        unidad = g.pop('unidad_de_trabajo', None)
+        if unidad is not None:
+            try:
+                if response.status_code < 400:
+                    unidad.confirmar()
+                else:
+                    unidad.descartar()
+            finally:
+                unidad.cerrar()
+        return response
+    
+    @app.teardown_request
+    def cerrar_unidad_de_trabajo(error=None):
+        # Solo queda algo aquí si otro after_request falló antes de este; al cerrar se deshace
+        unidad = g.pop('unidad_de_trabajo', None)
+        if unidad is not None:
+            unidad.cerrar()
+
+
+def tras_confirmar(callback):
+    """
+    Ejecutar callback cuando lo escrito se confirme de verdad. Durante una
+    solicitud conn.commit() no confirma nada (lo hace la unidad de trabajo en
+    after_request), así que se difiere hasta ese commit; fuera de ella se ejecuta ya.
+    """
+    unidad = g.get('unidad_de_trabajo') if _unidad_de_trabajo_activa() else None
+    if unidad is None:
+        callback()
+    else:
+        unidad.tras_confirmar(callback)
+
+
+def liberar_unidad_de_trabajo():
+    """
+    Confirmar ya lo escrito en la solicitud y devolver su conexión al pool. Se
+    llama antes de una llamada HTTP externa (Brevo, Nominatim) para no retener
+    la conexión ni los bloqueos de fila mientras se espera la respuesta; la
+    siguiente get_connection() de la solicitud abre otra unidad de trabajo.
+    """
+    unidad = g.pop('unidad_de_trabajo', None) if _unidad_de_trabajo_activa() else None
+    if unidad is not None:
+        try:
+            unidad.confirmar()
+        finally:
+            unidad.cerrar()
+
+
 def get_connection():
-    """Obtener conexión a PostgreSQL"""
+    """
+    Obtener conexión a PostgreSQL (close() la devuelve al pool).
+    Dentro de la aplicación se toma del pool del engine de SQLAlchemy, así
+    el SQL puro y el ORM comparten conexiones; fuera de ella (scripts) se usa
+    el pool propio. Durante una solicitud todas las llamadas comparten la
+    conexión y la transacción de la unidad de trabajo.
+    """
+    if _unidad_de_trabajo_activa():
+        if 'unidad_de_trabajo' not in g:
+            g.unidad_de_trabajo = UnidadDeTrabajo()
+        return g.unidad_de_trabajo.conexion()
+    return _conexion_pool()
+
+
+@contextmanager
+def conexion():
+    """Context manager para usar una conexión del pool: with conexion() as conn: ..."""
+    conn = get_connection()
     try:
-        conn = pg8000.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print(f"Error conectando a PostgreSQL: {e}")
-        raise
+        yield conn
+    finally:
+        conn.close()
+
+# ===== CONTEO DE CONSULTAS (presupuesto de consultas por endpoint) =====
+
+_conteo_consultas = threading.local()
+
+
+def _contar_consulta(conn, cursor, statement, parameters, context, executemany):
+    contadores = getattr(_conteo_consultas, 'activos', None)
+    if contadores:
+        for contador in contadores:
+            contador['total'] += 1
+
+
+@contextmanager
+def contar_consultas():
+    """
+    Contar las sentencias que el ORM envía a la base de datos en este hilo.
+    Uso: with contar_consultas() as consultas: ...; assert consultas['total'] <= 2
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    if not event.contains(Engine, 'before_cursor_execute', _contar_consulta):
+        event.listen(Engine, 'before_cursor_execute', _contar_consulta)
+    
+    contador = {'total': 0}
+    if not hasattr(_conteo_consultas, 'activos'):
+        _conteo_consultas.activos = []
+    _conteo_consultas.activos.append(contador)
+    try:
+        yield contador
+    finally:
+        _conteo_consultas.activos.remove(contador)
+
+
+def registrar_contador_consultas(app):
+    """Agregar X-Query-Count a cada respuesta (activar con CONTAR_CONSULTAS=true)"""
+    
+    @app.before_request
+    def iniciar_conteo_consultas():
+        g.conteo_consultas = contar_consultas()
+        g.consultas = g.conteo_consultas.__enter__()
+    
+    @app.after_request
+    def informar_conteo_consultas(response):
+        if 'consultas' in g:
+            response.headers['X-Query-Count'] = str(g.consultas['total'])
+        return response
+    
+    @app.teardown_request
+    def cerrar_conteo_consultas(error=None):
+        conteo = g.pop('conteo_consultas', None)
+        if conteo is not None:
+            conteo.__exit__(None, None, None)
+
 
 def init_db():
     """Inicializar base de datos"""
@@ -149,6 +643,7 @@ def init_db():
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_movimientos_producto ON movimientos(ID_Producto)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos(Fecha)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_productos_activos ON productos(Activo)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos(Categoria)')
 
         conn.commit()
         print("Base de datos inicializada correctamente")
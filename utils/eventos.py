@@ -0,0 +1,140 @@
+# utils/eventos.py - PUB/SUB DE EVENTOS DEL INVENTARIO (para /api/inventario/stream)
+import os
+import json
+import queue
+import threading
+import time
+import pg8000
+from utils.database import DB_CONFIG, get_connection
+
+# 'memoria' (un solo proceso) o 'postgres' (LISTEN/NOTIFY, compartido entre workers de gunicorn)
+EVENTOS_BACKEND = os.getenv('EVENTOS_BACKEND', 'memoria')
+EVENTOS_CANAL = os.getenv('EVENTOS_CANAL', 'inventario_eventos')
+EVENTOS_COLA_MAX = int(os.getenv('EVENTOS_COLA_MAX', 100))  # eventos pendientes por suscriptor
+
+
+class BackendMemoria:
+    """Reparte los eventos entre los suscriptores de este proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = set()
+
+    def suscribir(self):
+        cola = queue.Queue(maxsize=EVENTOS_COLA_MAX)
+        cola.desbordada = False  # True si se descartó algún evento para esta cola
+        with self._lock:
+            self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._suscriptores.discard(cola)
+
+    def publicar(self, evento):
+        self._entregar(evento)
+
+    def _entregar(self, evento):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for cola in suscriptores:
+            try:
+                cola.put_nowait(evento)
+            except queue.Full:
+                # Cliente lento: se pierde el evento y /stream le pide recargar la lista completa
+                cola.desbordada = True
+
+
+class BackendPostgres(BackendMemoria):
+    """Publica con pg_notify y escucha con LISTEN, así todos los workers reciben cada evento"""
+
+    def __init__(self, canal=EVENTOS_CANAL, intervalo=0.5):
+        super().__init__()
+        self.canal = canal
+        self.intervalo = intervalo
+        self._hilo = None
+
+    def suscribir(self):
+        self._iniciar_escucha()
+        return super().suscribir()
+
+    def publicar(self, evento):
+        # Dentro de una solicitud la notificación sale al confirmarse su transacción
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT pg_notify(%s, %s)", (self.canal, json.dumps(evento)))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _iniciar_escucha(self):
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._escuchar, name='eventos-listen', daemon=True)
+            self._hilo.start()
+
+    def _escuchar(self):
+        while True:
+            conn = None
+            try:
+                conn = pg8000.connect(**DB_CONFIG)
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f'LISTEN "{self.canal}"')
+
+                while True:
+                    # pg8000 solo lee las notificaciones al recibir mensajes del servidor
+                    cursor.execute("SELECT 1")
+                    while conn.notifications:
+                        _, _, payload = conn.notifications.popleft()
+                        try:
+                            self._entregar(json.loads(payload))
+                        except ValueError:
+                            pass
+                    time.sleep(self.intervalo)
+            except Exception as e:
+                print(f"❌ Error escuchando eventos de inventario: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+class BusEventos:
+    """Punto único para publicar y suscribirse a eventos del inventario"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def publicar(self, tipo, datos):
+        """Publicar un evento; un fallo aquí nunca interrumpe la operación que lo originó"""
+        try:
+            self.backend.publicar({'tipo': tipo, 'datos': datos})
+        except Exception as e:
+            print(f"❌ Error publicando evento {tipo}: {e}")
+
+    def suscribir(self):
+        return self.backend.suscribir()
+
+    def desuscribir(self, cola):
+        self.backend.desuscribir(cola)
+
+
+def crear_backend(nombre=EVENTOS_BACKEND):
+    if nombre == 'postgres':
+        return BackendPostgres()
+    return BackendMemoria()
+
+
+bus_eventos = BusEventos(crear_backend())
+
+
+def publicar_evento(tipo, datos):
+    """Publicar un evento en el bus del proceso"""
+    bus_eventos.publicar(tipo, datos)
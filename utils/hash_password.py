@@ -0,0 +1,168 @@
+# utils/hash_password.py - POOL DE PROCESOS PARA BCRYPT (FUERA DE LOS HILOS DE PETICIÓN)
+# Los procesos se crean con 'spawn', que vuelve a importar el script principal: un script que
+# hashee contraseñas debe tener su código bajo `if __name__ == '__main__':` o llamar a usar_hash_en_hilo().
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+HASH_CONFIG = {
+    'rondas': int(os.getenv('BCRYPT_ROUNDS', 12)),                 # costo de los hashes nuevos
+    'procesos': int(os.getenv('BCRYPT_PROCESOS', 2)),              # 0 = calcular en el mismo hilo
+    'capacidad': int(os.getenv('BCRYPT_COLA_MAX', 32)),            # operaciones en curso o en espera como máximo
+    'espera': float(os.getenv('BCRYPT_ESPERA', 10)),               # segundos para conseguir lugar y obtener el resultado
+}
+
+# Segundos que se sugieren en Retry-After cuando el pool está saturado (respuesta 503)
+BCRYPT_REINTENTAR = int(os.getenv('BCRYPT_REINTENTAR', 5))
+
+
+class HashSaturadoError(RuntimeError):
+    """La cola del pool de contraseñas está llena o no respondió a tiempo"""
+
+
+def _hashear(password, rondas):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rondas)).decode('utf-8')
+
+
+def _verificar(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PoolHashPassword:
+    """
+    bcrypt consume CPU y retiene el GIL del worker; aquí corre en un pool de
+    procesos propio. Un semáforo acota las operaciones pendientes: si no hay
+    lugar en `espera` segundos se lanza HashSaturadoError en vez de encolar sin límite.
+    """
+
+    def __init__(self, rondas=12, procesos=2, capacidad=32, espera=10):
+        self.rondas = rondas
+        self.procesos = procesos
+        self.capacidad = capacidad
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._lugares = threading.BoundedSemaphore(capacidad)
+        self._metricas = {'completadas': 0, 'rechazadas': 0, 'rehashes': 0, 'pools_rotos': 0,
+                          'tiempo_total': 0.0, 'tiempo_max': 0.0}
+
+    def _obtener_pool(self):
+        """Crear el pool al primer uso, de nuevo en el hijo tras un fork y tras descartar uno roto"""
+        if self._pid == os.getpid() and self._pool is not None:
+            return self._pool
+        with self._lock:
+            if self._pid != os.getpid():
+                self._lugares = threading.BoundedSemaphore(self.capacidad)
+                self._pool = None
+                self._pid = os.getpid()
+            if self._pool is None:
+                # 'spawn': los procesos no heredan los hilos ni conexiones del worker web
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _descartar_pool(self, pool):
+        """Olvidar un pool roto (p. ej. un proceso hijo terminado por falta de memoria)"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._metricas['pools_rotos'] += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ejecutar(self, func, *args):
+        if self.procesos <= 0:
+            return func(*args)
+
+        pool = self._obtener_pool()
+        try:
+            return self._ejecutar_en(pool, func, *args)
+        except BrokenProcessPool:
+            # Se reintenta una vez con un pool nuevo; si vuelve a romperse se propaga
+            print("⚠️ Pool de contraseñas roto, se crea uno nuevo")
+            self._descartar_pool(pool)
+            pool = self._obtener_pool()
+            try:
+                return self._ejecutar_en(pool, func, *args)
+            except BrokenProcessPool:
+                self._descartar_pool(pool)
+                raise
+
+    def _ejecutar_en(self, pool, func, *args):
+        lugares = self._lugares
+        inicio = time.monotonic()
+        if not lugares.acquire(timeout=self.espera):
+            with self._lock:
+                self._metricas['rechazadas'] += 1
+            raise HashSaturadoError('Servicio de contraseñas saturado, intenta de nuevo')
+        try:
+            futuro = pool.submit(func, *args)
+        except Exception:
+            lugares.release()
+            raise
+        # El lugar se libera cuando el proceso termina, aunque quien esperaba ya se haya ido
+        futuro.add_done_callback(lambda _: lugares.release())
+        try:
+            resultado = futuro.result(timeout=max(self.espera - (time.monotonic() - inicio), 0.1))
+        except TimeoutError:
+            with self._lock:
+                self._metricas['rechazadas'] += 1
+            raise HashSaturadoError('Servicio de contraseñas saturado, intenta de nuevo')
+
+        duracion = time.monotonic() - inicio
+        with self._lock:
+            self._metricas['completadas'] += 1
+            self._metricas['tiempo_total'] += duracion
+            self._metricas['tiempo_max'] = max(self._metricas['tiempo_max'], duracion)
+        return resultado
+
+    def hashear(self, password):
+        return self._ejecutar(_hashear, password, self.rondas)
+
+    def verificar(self, password, hashed_password):
+        return self._ejecutar(_verificar, password, hashed_password)
+
+    def necesita_rehash(self, hashed_password):
+        """True si el hash guardado usa un costo distinto de BCRYPT_ROUNDS (formato $2b$<costo>$...)"""
+        try:
+            return int(hashed_password.split('$')[2]) != self.rondas
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def registrar_rehash(self):
+        with self._lock:
+            self._metricas['rehashes'] += 1
+
+    def estadisticas(self):
+        """Métricas del pool de este proceso (segundos)"""
+        with self._lock:
+            metricas = dict(self._metricas)
+        return {
+            'rondas': self.rondas,
+            'procesos': self.procesos,
+            'capacidad': self.capacidad,
+            'completadas': metricas['completadas'],
+            'rechazadas': metricas['rechazadas'],
+            'rehashes': metricas['rehashes'],
+            'pools_rotos': metricas['pools_rotos'],
+            'tiempo_promedio': round(metricas['tiempo_total'] / metricas['completadas'], 4) if metricas['completadas'] else 0,
+            'tiempo_max': round(metricas['tiempo_max'], 4)
+        }
+
+
+pool_hash_password = PoolHashPassword(**HASH_CONFIG)
+
+
+def usar_hash_en_hilo():
+    """
+    Para scripts con código al nivel del módulo: calcular bcrypt en el mismo hilo,
+    porque cada proceso del pool volvería a ejecutar el script. Se respeta
+    BCRYPT_PROCESOS si se fijó explícitamente.
+    """
+    if 'BCRYPT_PROCESOS' not in os.environ:
+        pool_hash_password.procesos = 0
@@ -0,0 +1,174 @@
+# utils/importacion.py - IMPORTACIÓN MASIVA DE PRODUCTOS (CSV / NDJSON)
+import csv
+import io
+import json
+import os
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Producto, VersionCatalogo
+from utils.eventos import publicar_evento
+
+# Filas por lote de INSERT ... ON CONFLICT (una transacción por lote)
+IMPORTACION_LOTE = int(os.getenv('IMPORTACION_LOTE', 500))
+# Errores por fila que se devuelven como máximo en el resumen
+IMPORTACION_MAX_ERRORES = int(os.getenv('IMPORTACION_MAX_ERRORES', 1000))
+
+CAMPOS_TEXTO = ['Codigo', 'Nombre', 'Descripcion', 'Categoria', 'Unidad']
+CAMPOS_ENTEROS = ['Stock_Minimo', 'Stock_Actual']
+CAMPOS_REQUERIDOS = ['Codigo', 'Nombre', 'Unidad']
+
+# Al actualizar un producto existente no se toca Stock_Actual: el stock solo cambia con movimientos.
+# De estos solo se actualizan los que trae la fila (cabecera del CSV o claves del objeto NDJSON)
+CAMPOS_ACTUALIZABLES = ['Nombre', 'Descripcion', 'Categoria', 'Unidad', 'Stock_Minimo', 'Activo']
+
+
+def detectar_formato(nombre_archivo=None, content_type=None):
+    """Deducir 'csv' o 'ndjson' a partir del nombre de archivo o del Content-Type"""
+    nombre_archivo = (nombre_archivo or '').lower()
+    content_type = (content_type or '').lower()
+    if nombre_archivo.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+
+def leer_filas(flujo, formato='csv'):
+    """
+    Leer filas de un flujo binario sin cargarlo completo en memoria.
+    Genera (numero_fila, datos) o (numero_fila, error) si la línea no se puede interpretar.
+    """
+    texto = io.TextIOWrapper(flujo, encoding='utf-8-sig', newline='')
+
+    if formato == 'ndjson':
+        for numero, linea in enumerate(texto, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                yield numero, 'JSON inválido'
+                continue
+            yield numero, datos if isinstance(datos, dict) else 'Cada línea debe ser un objeto JSON'
+    else:
+        lector = csv.DictReader(texto)
+        for numero, fila in enumerate(lector, start=2):  # la fila 1 es la cabecera
+            yield numero, fila
+
+
+def validar_fila(datos):
+    """Normalizar una fila de producto. Devuelve (producto, None) o (None, mensaje_error)"""
+    producto = {}
+    for campo in CAMPOS_TEXTO:
+        valor = datos.get(campo)
+        producto[campo] = str(valor).strip() if valor not in (None, '') else None
+
+    for campo in CAMPOS_REQUERIDOS:
+        if not producto[campo]:
+            return None, f'El campo {campo} es requerido'
+
+    if len(producto['Codigo']) > 50 or len(producto['Nombre']) > 100 or len(producto['Unidad']) > 20:
+        return None, 'Codigo, Nombre o Unidad exceden la longitud máxima'
+    if producto['Categoria'] and len(producto['Categoria']) > 50:
+        return None, 'Categoria excede la longitud máxima'
+
+    for campo in CAMPOS_ENTEROS:
+        valor = datos.get(campo)
+        if valor in (None, ''):
+            producto[campo] = 0
+            continue
+        try:
+            producto[campo] = int(valor)
+        except (TypeError, ValueError):
+            return None, f'{campo} debe ser un número entero'
+        if producto[campo] < 0:
+            return None, f'{campo} no puede ser negativo'
+
+    activo = datos.get('Activo', True)
+    if isinstance(activo, str):
+        activo = activo.strip().lower() not in ('0', 'false', 'no', 'inactivo')
+    producto['Activo'] = bool(activo)
+
+    return producto, None
+
+
+def columnas_presentes(datos):
+    """Campos actualizables que vienen en la fila; los ausentes conservan su valor en productos existentes"""
+    return tuple(campo for campo in CAMPOS_ACTUALIZABLES if campo in datos)
+
+
+def _sentencia_upsert(columnas):
+    """INSERT ... ON CONFLICT (Codigo) DO UPDATE de `columnas`, según el motor de la sesión"""
+    dialecto = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    sentencia = dialecto.insert(Producto)
+    return sentencia.on_conflict_do_update(
+        index_elements=[Producto.Codigo],
+        set_={campo: getattr(sentencia.excluded, campo) for campo in columnas}
+    )
+
+
+def importar_productos(filas, tamano_lote=IMPORTACION_LOTE):
+    """
+    Insertar o actualizar productos por lotes. Las filas inválidas se informan
+    en el resumen sin detener la importación; si un lote falla en la base de
+    datos se descarta solo ese lote. Tras cada lote confirmado se avisa a los
+    tableros conectados (/stream) con un evento 'resync'.
+    """
+    # Import diferido: el controlador importa este módulo
+    from controllers.inventario_controller import evaluar_alerta_stock
+
+    resumen = {'procesadas': 0, 'importadas': 0, 'errores': [], 'total_errores': 0}
+
+    def registrar_error(numero, mensaje):
+        resumen['total_errores'] += 1
+        if len(resumen['errores']) < IMPORTACION_MAX_ERRORES:
+            resumen['errores'].append({'fila': numero, 'error': mensaje})
+
+    def aplicar_lote(lote):
+        # Un mismo Codigo dos veces en un lote rompe ON CONFLICT: gana la última fila
+        por_codigo = {}
+        for numero, producto, columnas in lote:
+            por_codigo[producto['Codigo']] = (numero, producto, columnas)
+        # Un upsert por combinación de columnas (en CSV es siempre una sola: la cabecera)
+        por_columnas = {}
+        for _, producto, columnas in por_codigo.values():
+            por_columnas.setdefault(columnas, []).append(producto)
+        try:
+            for columnas, productos in por_columnas.items():
+                db.session.execute(_sentencia_upsert(columnas), productos)
+            # Estado de alerta en la misma transacción: cubre los productos nuevos y los cambios de Stock_Minimo o Activo
+            actualizados = Producto.query.filter(Producto.Codigo.in_(por_codigo)) \
+                .execution_options(populate_existing=True).all()
+            for producto in actualizados:
+                evaluar_alerta_stock(producto.to_dict())
+            VersionCatalogo.incrementar()
+            db.session.commit()
+            resumen['importadas'] += len(por_codigo)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            for numero, _, _ in por_codigo.values():
+                registrar_error(numero, f'Error de base de datos en el lote: {e.__class__.__name__}')
+            return
+        # Un lote puede tocar cientos de productos: los tableros recargan en vez de recibir un evento por producto
+        publicar_evento('resync', {'motivo': 'importacion', 'productos': len(por_codigo)})
+
+    lote = []
+    for numero, datos in filas:
+        resumen['procesadas'] += 1
+        if isinstance(datos, str):
+            registrar_error(numero, datos)
+            continue
+
+        producto, error = validar_fila(datos)
+        if error:
+            registrar_error(numero, error)
+            continue
+
+        lote.append((numero, producto, columnas_presentes(datos)))
+        if len(lote) >= tamano_lote:
+            aplicar_lote(lote)
+            lote = []
+
+    if lote:
+        aplicar_lote(lote)
+
+    return resumen
@@ -0,0 +1,121 @@
+# utils/limite_login.py - LÍMITE DE INTENTOS DE LOGIN (VENTANA DESLIZANTE POR EMAIL E IP)
+import os
+import threading
+import time
+from collections import deque
+from flask import request
+
+LIMITE_LOGIN_CONFIG = {
+    'ventana': float(os.getenv('LOGIN_VENTANA', 300)),               # segundos en que se cuentan los fallos
+    'max_fallos_email': int(os.getenv('LOGIN_MAX_FALLOS_EMAIL', 5)),
+    'max_fallos_ip': int(os.getenv('LOGIN_MAX_FALLOS_IP', 20)),
+    'bloqueo_base': float(os.getenv('LOGIN_BLOQUEO_BASE', 30)),      # primer bloqueo; se duplica en cada reincidencia
+    'bloqueo_max': float(os.getenv('LOGIN_BLOQUEO_MAX', 3600)),
+    'max_claves': int(os.getenv('LOGIN_MAX_CLAVES', 50000)),         # claves en memoria antes de purgar
+}
+
+# Detrás del proxy de Render la IP real llega en X-Forwarded-For
+LOGIN_CONFIAR_PROXY = os.getenv('LOGIN_CONFIAR_PROXY', os.getenv('RENDER', 'false')).lower() == 'true'
+
+
+def ip_cliente():
+    """IP del cliente; con LOGIN_CONFIAR_PROXY se toma la que agregó el proxy (último valor de X-Forwarded-For)"""
+    if LOGIN_CONFIAR_PROXY:
+        reenviada = request.headers.get('X-Forwarded-For', '')
+        if reenviada:
+            return reenviada.split(',')[-1].strip()
+    return request.remote_addr or 'desconocida'
+
+
+class LimitadorLogin:
+    """
+    Cuenta los logins fallidos por email y por IP en una ventana deslizante.
+    Al llegar al máximo la clave queda bloqueada bloqueo_base * 2^(n-1) segundos
+    (n = bloqueos seguidos, tope bloqueo_max). La consulta se hace antes de
+    tocar la base de datos o bcrypt. El estado es de cada proceso.
+    """
+
+    def __init__(self, ventana=300, max_fallos_email=5, max_fallos_ip=20,
+                 bloqueo_base=30, bloqueo_max=3600, max_claves=50000):
+        self.ventana = ventana
+        self.max_fallos = {'email': max_fallos_email, 'ip': max_fallos_ip}
+        self.bloqueo_base = bloqueo_base
+        self.bloqueo_max = bloqueo_max
+        self.max_claves = max_claves
+        self._lock = threading.Lock()
+        self._fallos = {}      # clave -> deque de instantes de fallo
+        self._bloqueos = {}    # clave -> (bloqueado_hasta, bloqueos_seguidos)
+        self._metricas = {'permitidos': 0, 'rechazados': 0, 'fallos': 0, 'exitos': 0, 'bloqueos': 0}
+
+    @staticmethod
+    def _claves(email, ip):
+        return [('email', f"email:{(email or '').strip().lower()}"), ('ip', f'ip:{ip}')]
+
+    def espera(self, email, ip):
+        """Segundos que faltan para poder intentar de nuevo (0 si el intento está permitido)"""
+        ahora = time.monotonic()
+        with self._lock:
+            restante = 0
+            for _, clave in self._claves(email, ip):
+                bloqueo = self._bloqueos.get(clave)
+                if bloqueo and bloqueo[0] > ahora:
+                    restante = max(restante, bloqueo[0] - ahora)
+            self._metricas['rechazados' if restante else 'permitidos'] += 1
+        return int(restante) + 1 if restante else 0
+
+    def registrar_fallo(self, email, ip):
+        ahora = time.monotonic()
+        with self._lock:
+            self._metricas['fallos'] += 1
+            if len(self._fallos) >= self.max_claves:
+                self._purgar(ahora)
+
+            for tipo, clave in self._claves(email, ip):
+                fallos = self._fallos.setdefault(clave, deque())
+                fallos.append(ahora)
+                while fallos and fallos[0] <= ahora - self.ventana:
+                    fallos.popleft()
+                if len(fallos) < self.max_fallos[tipo]:
+                    continue
+
+                # Reincidir poco después de un bloqueo duplica el siguiente
+                hasta_anterior, seguidos = self._bloqueos.get(clave, (0, 0))
+                if hasta_anterior and ahora - hasta_anterior > self.bloqueo_max:
+                    seguidos = 0
+                seguidos += 1
+                duracion = min(self.bloqueo_base * (2 ** (seguidos - 1)), self.bloqueo_max)
+                self._bloqueos[clave] = (ahora + duracion, seguidos)
+                fallos.clear()
+                self._metricas['bloqueos'] += 1
+                print(f"⚠️ Login bloqueado {int(duracion)}s para {clave} (bloqueo #{seguidos})")
+
+    def registrar_exito(self, email, ip):
+        """Un login correcto limpia el historial del email (el de la IP se mantiene)"""
+        clave = self._claves(email, ip)[0][1]
+        with self._lock:
+            self._metricas['exitos'] += 1
+            self._fallos.pop(clave, None)
+            self._bloqueos.pop(clave, None)
+
+    def _purgar(self, ahora):
+        """Quitar claves sin fallos recientes ni bloqueos vigentes (o recientes) para acotar la memoria"""
+        for clave in [c for c, fallos in self._fallos.items() if not fallos or fallos[-1] <= ahora - self.ventana]:
+            del self._fallos[clave]
+        for clave in [c for c, (hasta, _) in self._bloqueos.items() if hasta <= ahora - self.bloqueo_max]:
+            del self._bloqueos[clave]
+
+    def estadisticas(self):
+        """Contadores del limitador de este proceso"""
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                **self._metricas,
+                'claves_vigiladas': len(self._fallos),
+                'bloqueadas_ahora': sum(1 for hasta, _ in self._bloqueos.values() if hasta > ahora),
+                'ventana': self.ventana,
+                'max_fallos_email': self.max_fallos['email'],
+                'max_fallos_ip': self.max_fallos['ip']
+            }
+
+
+limitador_login = LimitadorLogin(**LIMITE_LOGIN_CONFIG)
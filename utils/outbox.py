@@ -0,0 +1,221 @@
+# utils/outbox.py - DESPACHADOR DE LA TABLA notificaciones_outbox
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from models import db, NotificacionOutbox
+from utils.notifications import NotificacionesInventario
+
+OUTBOX_CONFIG = {
+    'lote': int(os.getenv('OUTBOX_LOTE', 50)),                     # notificaciones por ronda
+    'intervalo': float(os.getenv('OUTBOX_INTERVALO', 2)),          # segundos entre rondas sin trabajo
+    'max_intentos': int(os.getenv('OUTBOX_MAX_INTENTOS', 8)),      # después queda como 'fallida'
+    'espera_base': float(os.getenv('OUTBOX_ESPERA_BASE', 30)),     # segundos antes del primer reintento
+    'espera_max': float(os.getenv('OUTBOX_ESPERA_MAX', 3600)),     # tope del backoff exponencial
+    'reserva': float(os.getenv('OUTBOX_RESERVA', 300)),            # segundos que una fila queda reservada mientras se envía
+    # Modo resumen: entradas y salidas se juntan en un solo correo cada N minutos o M eventos
+    'resumen': os.getenv('NOTIF_RESUMEN', 'false').lower() == 'true',
+    'resumen_minutos': float(os.getenv('NOTIF_RESUMEN_MINUTOS', 15)),
+    'resumen_max_eventos': int(os.getenv('NOTIF_RESUMEN_MAX_EVENTOS', 100)),
+}
+
+# Solo estos métodos se pueden invocar desde la tabla
+TIPOS_PERMITIDOS = {
+    'notificar_nuevo_producto',
+    'notificar_entrada_inventario',
+    'notificar_salida_inventario',
+    'notificar_stock_agotado',
+    'notificar_stock_bajo',
+    'notificar_lote_movimientos',
+}
+
+# Tipos que en modo resumen esperan en la tabla hasta el próximo resumen (los avisos de stock salen al momento)
+TIPOS_RESUMEN = {
+    'notificar_entrada_inventario',
+    'notificar_salida_inventario',
+}
+
+
+def _reservar(limite):
+    """
+    Tomar notificaciones vencidas y moverles el próximo intento hacia adelante.
+    Con FOR UPDATE SKIP LOCKED varios despachadores no toman la misma fila; si el
+    proceso muere a mitad del envío, la fila vuelve a estar disponible al vencer la reserva.
+    """
+    ahora = datetime.utcnow()
+    consulta = select(NotificacionOutbox).where(
+        NotificacionOutbox.Estado == 'pendiente', NotificacionOutbox.Proximo_Intento <= ahora
+    )
+    if OUTBOX_CONFIG['resumen']:
+        consulta = consulta.where(NotificacionOutbox.Tipo.not_in(TIPOS_RESUMEN))
+    notificaciones = db.session.execute(
+        consulta
+        .order_by(NotificacionOutbox.Proximo_Intento)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    for notificacion in notificaciones:
+        notificacion.Intentos += 1
+        notificacion.Proximo_Intento = ahora + timedelta(seconds=OUTBOX_CONFIG['reserva'])
+    db.session.commit()
+    return notificaciones
+
+
+def _enviar(notificacion):
+    """Invocar el método de NotificacionesInventario. Lanza excepción si hay que reintentar"""
+    if notificacion.Tipo not in TIPOS_PERMITIDOS:
+        raise ValueError(f'Tipo de notificación desconocido: {notificacion.Tipo}')
+
+    # Los notificar_* relanzan sus errores (p. ej. sin acceso a la tabla de usuarios);
+    # una lista vacía solo significa que no hay destinatarios
+    resultados = getattr(NotificacionesInventario, notificacion.Tipo)(*notificacion.Argumentos)
+    if resultados and not any(exito for _, exito in resultados):
+        raise RuntimeError('No se pudo enviar a ningún destinatario')
+
+
+def _espera_reintento(intentos):
+    return min(OUTBOX_CONFIG['espera_base'] * (2 ** (intentos - 1)), OUTBOX_CONFIG['espera_max'])
+
+
+def despachar_resumen():
+    """
+    Modo resumen: si hay NOTIF_RESUMEN_MAX_EVENTOS entradas/salidas pendientes o la
+    más antigua espera desde hace NOTIF_RESUMEN_MINUTOS, enviarlas en un solo correo.
+    Devuelve cuántas notificaciones cubrió el resumen.
+    """
+    ahora = datetime.utcnow()
+    limite = OUTBOX_CONFIG['resumen_max_eventos']
+    pendientes = db.session.execute(
+        select(NotificacionOutbox)
+        .where(NotificacionOutbox.Estado == 'pendiente',
+               NotificacionOutbox.Proximo_Intento <= ahora,
+               NotificacionOutbox.Tipo.in_(TIPOS_RESUMEN))
+        .order_by(NotificacionOutbox.Fecha_Creacion)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    vencido = pendientes and pendientes[0].Fecha_Creacion <= ahora - timedelta(minutes=OUTBOX_CONFIG['resumen_minutos'])
+    if not pendientes or (len(pendientes) < limite and not vencido):
+        db.session.rollback()
+        return 0
+
+    for notificacion in pendientes:
+        notificacion.Intentos += 1
+        notificacion.Proximo_Intento = ahora + timedelta(seconds=OUTBOX_CONFIG['reserva'])
+    db.session.commit()
+
+    try:
+        resultados = NotificacionesInventario.notificar_resumen_movimientos(
+            [(notificacion.Tipo, notificacion.Argumentos) for notificacion in pendientes]
+        )
+        if resultados and not any(exito for _, exito in resultados):
+            raise RuntimeError('No se pudo enviar a ningún destinatario')
+        for notificacion in pendientes:
+            notificacion.Estado = 'enviada'
+            notificacion.Fecha_Envio = datetime.utcnow()
+            notificacion.Ultimo_Error = None
+    except Exception as e:
+        print(f"❌ Error enviando resumen de {len(pendientes)} movimientos: {e}")
+        for notificacion in pendientes:
+            notificacion.Ultimo_Error = str(e)[:1000]
+            if notificacion.Intentos >= OUTBOX_CONFIG['max_intentos']:
+                notificacion.Estado = 'fallida'
+            else:
+                notificacion.Proximo_Intento = datetime.utcnow() + timedelta(
+                    seconds=_espera_reintento(notificacion.Intentos)
+                )
+    db.session.commit()
+    return len(pendientes)
+
+
+def despachar_lote(limite=None):
+    """Enviar una ronda de notificaciones pendientes. Devuelve cuántas se procesaron"""
+    resumidas = despachar_resumen() if OUTBOX_CONFIG['resumen'] else 0
+
+    notificaciones = _reservar(limite or OUTBOX_CONFIG['lote'])
+
+    for notificacion in notificaciones:
+        try:
+            _enviar(notificacion)
+            notificacion.Estado = 'enviada'
+            notificacion.Fecha_Envio = datetime.utcnow()
+            notificacion.Ultimo_Error = None
+        except Exception as e:
+            notificacion.Ultimo_Error = str(e)[:1000]
+            if notificacion.Intentos >= OUTBOX_CONFIG['max_intentos'] or notificacion.Tipo not in TIPOS_PERMITIDOS:
+                notificacion.Estado = 'fallida'
+                print(f"❌ Notificación {notificacion.Clave} descartada tras {notificacion.Intentos} intentos: {e}")
+            else:
+                notificacion.Proximo_Intento = datetime.utcnow() + timedelta(
+                    seconds=_espera_reintento(notificacion.Intentos)
+                )
+        # Confirmar fila por fila: un envío ya hecho no se repite si falla el siguiente
+        db.session.commit()
+
+    return resumidas + len(notificaciones)
+
+
+def estadisticas():
+    """
+    Estado de notificaciones_outbox, común a todos los procesos: cuántas hay por
+    estado, antigüedad de la pendiente más vieja (segundos) y cuántas pendientes
+    o fallidas llevan cada número de intentos.
+    """
+    por_estado = dict(db.session.execute(
+        select(NotificacionOutbox.Estado, func.count()).group_by(NotificacionOutbox.Estado)
+    ).all())
+    mas_antigua = db.session.execute(
+        select(func.min(NotificacionOutbox.Fecha_Creacion)).where(NotificacionOutbox.Estado == 'pendiente')
+    ).scalar()
+    intentos = db.session.execute(
+        select(NotificacionOutbox.Intentos, func.count())
+        .where(NotificacionOutbox.Estado != 'enviada')
+        .group_by(NotificacionOutbox.Intentos)
+        .order_by(NotificacionOutbox.Intentos)
+    ).all()
+
+    return {
+        'pendientes': por_estado.get('pendiente', 0),
+        'fallidas': por_estado.get('fallida', 0),
+        'enviadas': por_estado.get('enviada', 0),
+        'antiguedad_pendiente_segundos': round((datetime.utcnow() - mas_antigua).total_seconds(), 1) if mas_antigua else 0,
+        'intentos': {str(numero): cantidad for numero, cantidad in intentos},
+        'max_intentos': OUTBOX_CONFIG['max_intentos']
+    }
+
+
+def ejecutar_despachador(app, detener=None):
+    """Bucle del despachador: procesa rondas hasta que `detener` (threading.Event) se active"""
+    detener = detener or threading.Event()
+    while not detener.is_set():
+        procesadas = 0
+        try:
+            with app.app_context():
+                procesadas = despachar_lote()
+        except Exception as e:
+            print(f"❌ Error en despachador de notificaciones: {e}")
+        if procesadas < OUTBOX_CONFIG['lote']:
+            detener.wait(OUTBOX_CONFIG['intervalo'])
+
+
+def registrar_despachador_interno(app):
+    """
+    Despachar desde un hilo del propio proceso web (cuando no corre
+    despachar_notificaciones.py). El hilo arranca con la primera solicitud de
+    cada proceso, así cada worker de gunicorn (también con --preload) tiene el suyo.
+    """
+    estado = {'pid': None}
+    lock = threading.Lock()
+
+    @app.before_request
+    def iniciar_despachador_interno():
+        if estado['pid'] == os.getpid():
+            return
+        with lock:
+            if estado['pid'] == os.getpid():
+                return
+            estado['pid'] = os.getpid()
+            threading.Thread(target=ejecutar_despachador, args=(app,),
+                             name='outbox-despachador', daemon=True).start()
@@ -0,0 +1,57 @@
+# utils/plantillas_correo.py - PLANTILLAS JINJA2 PRECOMPILADAS PARA LOS CORREOS DE INVENTARIO
+import os
+from datetime import datetime
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+DIRECTORIO_PLANTILLAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'correos')
+
+# Entorno propio (no el de Flask): se usa desde hilos y procesos sin contexto de aplicación
+_entorno = Environment(
+    loader=FileSystemLoader(DIRECTORIO_PLANTILLAS),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,  # compiladas una sola vez por proceso
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+PLANTILLAS = [
+    'nuevo_producto.html',
+    'entrada_inventario.html',
+    'salida_inventario.html',
+    'stock_agotado.html',
+    'stock_bajo.html',
+    'lote_movimientos.html',
+    'resumen_movimientos.html',
+]
+
+_MARCADOR_CONTENIDO = '\x00contenido\x00'
+
+
+def _compilar():
+    """Compilar todas las plantillas al importar el módulo"""
+    return {nombre: _entorno.get_template(nombre) for nombre in PLANTILLAS}
+
+
+_compiladas = _compilar()
+
+
+@lru_cache(maxsize=4)
+def _envoltorio(anio):
+    """Parte estática del correo (cabecera con CSS y pie) renderizada una vez por año"""
+    html = _entorno.get_template('base.html').render(contenido=_MARCADOR_CONTENIDO, anio=anio)
+    inicio, fin = html.split(_MARCADOR_CONTENIDO)
+    return inicio, fin
+
+
+def envolver(cuerpo_html):
+    """Insertar el cuerpo ya renderizado en la plantilla base del correo"""
+    inicio, fin = _envoltorio(datetime.now().year)
+    return f'{inicio}{cuerpo_html}{fin}'
+
+
+def renderizar(nombre, **contexto):
+    """Renderizar el cuerpo de un correo; 'fecha' se completa con la hora actual si no se pasa"""
+    contexto.setdefault('fecha', datetime.now().strftime('%d/%m/%Y %H:%M'))
+    return Markup(_compiladas[nombre].render(**contexto))
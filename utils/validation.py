@@ -1,15 +1,17 @@
 import re
-import bcrypt
+from utils.hash_password import pool_hash_password
 
 def encriptar_password(password):
-    """Encriptar contraseña usando bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')
+    """Encriptar contraseña usando bcrypt (en el pool de procesos, con costo BCRYPT_ROUNDS)"""
+    return pool_hash_password.hashear(password)
 
 def verificar_password(password, hashed_password):
-    """Verificar contraseña contra hash almacenado"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """Verificar contraseña contra hash almacenado (en el pool de procesos)"""
+    return pool_hash_password.verificar(password, hashed_password)
+
+def password_necesita_rehash(hashed_password):
+    """Indicar si el hash guardado se generó con un costo distinto al configurado"""
+    return pool_hash_password.necesita_rehash(hashed_password)
 
 def validar_email(email):
     """Validar formato de email"""